@@ -0,0 +1,109 @@
+import gzip
+import os
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Streamed bodies must reach the client as they are produced
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def choose_encoding(accept_encoding):
+    """Pick brotli or gzip from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _compressible(headers):
+    content_type = headers.get("content-type", "")
+    if "content-encoding" in headers or content_type.startswith(STREAMING_MEDIA_TYPES):
+        return False
+    return content_type.startswith(("application/json", "text/"))
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete JSON/text bodies of `minimum_size` bytes or more.
+
+    Uses brotli when the client accepts it and the library is installed, gzip
+    otherwise. Streaming responses (SSE, NDJSON or any body sent in several
+    parts) pass through untouched, unlike Starlette's GZipMiddleware, which
+    would buffer them inside the compressor.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        held_start = None
+        started = False
+
+        async def send_compressed(message):
+            nonlocal held_start, started
+            if message["type"] == "http.response.start":
+                # Held until the first body part shows whether the body is complete
+                held_start = message
+                return
+            if started or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            started = True
+            held_start["headers"] = list(held_start.get("headers", []))
+            headers = MutableHeaders(raw=held_start["headers"])
+            body = message.get("body", b"")
+            if not _compressible(headers):
+                await send(held_start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(held_start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send(held_start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
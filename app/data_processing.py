@@ -1,11 +1,49 @@
-from app.elastic_reference_loader import load_reference_tables
+from app.reference_store import reference_store
+from app.match_trends import compute_match_trends
+from app.metrics import track_stage
 import json
 import os
 import asyncio
 
+DETAILED_METRICS = [
+    'accuracy_enemy_spotted', 'accuracy_head', 'counter_strafing_good_shots_ratio',
+    'flashbang_hit_foe_avg_duration', 'flashbang_hit_foe_per_flashbang', 
+    'flashbang_hit_friend_per_flashbang', 'flashbang_leading_to_kill',
+    'he_foes_damage_avg', 'he_friends_damage_avg', 'preaim', 
+    'reaction_time_ms', 'spray_accuracy', 'utility_on_death_avg'
+]
+
+# Metrics where a negative diff means above average performance
+LOWER_IS_BETTER_METRICS = [
+    'flashbang_hit_friend_per_flashbang', 'he_friends_damage_avg', 'preaim',
+    'reaction_time_ms', 'utility_on_death_avg'
+]
+
 async def analyze_player_data(profile, matches, steam_id=None, save_json=False):
-    # Load reference tables from Elasticsearch
-    premier_reference, faceit_reference, leetify_tiers = await load_reference_tables()
+    # Reference tables are served from the in-process store, refreshed in the background
+    tables = await reference_store.get()
+    with track_stage("analysis"):
+        analysis = build_analysis(profile, tables, matches, steam_id)
+
+    # Save analysis to JSON file if requested
+    if save_json:
+        try:
+            filename = f"analysis_{steam_id or 'unknown'}.json"
+            with open(filename, 'w') as f:
+                json.dump(analysis, f, indent=2)
+        except Exception as e:
+            print(f"Warning: Could not save analysis to file: {e}")
+    
+    return analysis
+
+def build_analysis(profile, tables, matches=None, steam_id=None):
+    """Compare a Leetify profile against the loaded reference tables.
+
+    When `matches` is given, trends over the player's match history are added
+    under `match_trends`.
+
+    Pure and synchronous so it can be run over many players with one set of tables.
+    """
     rating = profile["rating"]
     ranks = profile["ranks"]
     stats = profile["stats"]
@@ -16,7 +54,7 @@ async def analyze_player_data(profile, matches, steam_id=None, save_json=False):
         "utility_diff": None,
         "reference_values": None,
         "reference_rank": None,
-        "leetify_tiers": leetify_tiers,
+        "leetify_tiers": tables.leetify_tiers,
         "metric_names": {
             "aim": "Aim",
             "positioning": "Positioning", 
@@ -45,24 +83,19 @@ async def analyze_player_data(profile, matches, steam_id=None, save_json=False):
     reference_rank = None
     
     if faceit_elo:
-        for (low, high), v in faceit_reference.items():
-            if low <= faceit_elo <= high:
-                reference = v
-                reference_rank = f"Faceit Level {faceit_level}"
-                break
+        match = tables.faceit_index.find(faceit_elo)
+        if match:
+            reference = match[1]
+            reference_rank = f"Faceit Level {faceit_level}"
     elif premier:
-        for (low, high), v in premier_reference.items():
-            if low <= premier <= high:
-                reference = v
-                reference_rank = f"Premier {low}-{high}"
-                break
-    else:
+        match = tables.premier_index.find(premier)
+        if match:
+            (low, high), reference = match
+            reference_rank = f"Premier {low}-{high}"
+    elif tables.premier_index.fallback:
         # Fallback to 10000-14999 premier range if no rank available
-        for (low, high), v in premier_reference.items():
-            if low == 10000 and high == 14999:
-                reference = v
-                reference_rank = f"Premier: {low}-{high} (Default)"
-                break
+        (low, high), reference = tables.premier_index.fallback
+        reference_rank = f"Premier: {low}-{high} (Default)"
 
     if reference:
         # Store reference rank information
@@ -90,42 +123,22 @@ async def analyze_player_data(profile, matches, steam_id=None, save_json=False):
         analysis["utility_diff"] = round(rating["utility"] - reference["Utility"], 2)
         
         # Calculate differences for detailed metrics if they exist in rating
-        detailed_metrics = [
-            'accuracy_enemy_spotted', 'accuracy_head', 'counter_strafing_good_shots_ratio',
-            'flashbang_hit_foe_avg_duration', 'flashbang_hit_foe_per_flashbang', 
-            'flashbang_hit_friend_per_flashbang', 'flashbang_leading_to_kill',
-            'he_foes_damage_avg', 'he_friends_damage_avg', 'preaim', 
-            'reaction_time_ms', 'spray_accuracy', 'utility_on_death_avg'
-        ]
-        
-        for metric in detailed_metrics:
+        for metric in DETAILED_METRICS:
             if metric in stats and metric in reference:
                 analysis[f"{metric}_diff"] = round(stats[metric] - reference[metric], 2)
         
         # Add raw values for side-specific and situational metrics with tier evaluation
         
-        def get_tier(value):
-            for tier, (low, high) in leetify_tiers.items():
-                if low <= value <= high:
-                    return tier
-            return "unknown"
-        
         raw_metrics = ['clutch', 'opening', 'ct_leetify', 't_leetify']
         for metric in raw_metrics:
             if metric in rating:
                 value = round(rating[metric], 2)
                 analysis[metric] = value
-                analysis[f"{metric}_tier"] = get_tier(value)
+                match = tables.tier_index.find(value)
+                analysis[f"{metric}_tier"] = match[1] if match else "unknown"
 
+    steam_id = steam_id or profile.get("steam64_id")
+    if matches and steam_id:
+        analysis["match_trends"] = compute_match_trends(matches, steam_id, DETAILED_METRICS)
 
-
-    # Save analysis to JSON file if requested
-    if save_json:
-        try:
-            filename = f"analysis_{steam_id or 'unknown'}.json"
-            with open(filename, 'w') as f:
-                json.dump(analysis, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not save analysis to file: {e}")
-    
     return analysis
@@ -1,22 +1,56 @@
-from elasticsearch import AsyncElasticsearch
 import os
+import time
 from dotenv import load_dotenv
+from app.metrics import track_stage
 
 load_dotenv()
 
-# Connect to Elastic Serverless project
-es = AsyncElasticsearch(
-    os.getenv("ELASTIC_URL"),
-    api_key=os.getenv("ELASTIC_API_KEY")
-)
+ELASTIC_URL = os.getenv("ELASTIC_URL")
+ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
 
-async def index_player_data(steam_id, analysis, recommendations):
+_es = None
+
+def get_es():
+    """Return the shared Elastic Serverless client, creating it on first use."""
+    global _es
+    if _es is None:
+        # Imported here so the app starts without paying for the client library
+        from elasticsearch import AsyncElasticsearch
+        _es = AsyncElasticsearch(ELASTIC_URL, api_key=ELASTIC_API_KEY)
+    return _es
+
+async def close_es():
+    """Close the shared client. Called from the app lifespan on shutdown."""
+    global _es
+    if _es is not None:
+        await _es.close()
+        _es = None
+
+def build_player_document(steam_id, analysis, recommendations, analysis_hash=None):
+    return {
+        "steam_id": steam_id,
+        "analysis": analysis,
+        "recommendations": recommendations,
+        # Lets the recommendation cache find this document by content
+        "analysis_hash": analysis_hash,
+        "generated_at": time.time(),
+    }
+
+async def get_player_document(steam_id):
+    """The indexed document for a player, or None if there is none."""
+    try:
+        with track_stage("es_get"):
+            response = await get_es().get(index="player_training_data", id=steam_id)
+    except Exception as e:
+        if getattr(e, "status_code", None) != 404:
+            print(f"Elasticsearch lookup failed for {steam_id}: {e}")
+        return None
+    return response["_source"]
+
+async def index_player_data(steam_id, analysis, recommendations, analysis_hash=None):
     try:
-        doc = {
-            "steam_id": steam_id,
-            "analysis": analysis,
-            "recommendations": recommendations,
-        }
-        await es.index(index="player_training_data", id=steam_id, document=doc)
+        doc = build_player_document(steam_id, analysis, recommendations, analysis_hash)
+        with track_stage("es_index"):
+            await get_es().index(index="player_training_data", id=steam_id, document=doc)
     except Exception as e:
-        raise Exception(f"Elasticsearch indexing failed: {e}")
\ No newline at end of file
+        raise Exception(f"Elasticsearch indexing failed: {e}")
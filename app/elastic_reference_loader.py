@@ -1,10 +1,10 @@
-from app.elastic_client import es
+from app.elastic_client import get_es
 import asyncio
 
 async def load_leetify_thresholds():
     """Load Leetify tier thresholds from Elasticsearch"""
     try:
-        response = await es.search(index="leetify-references", body={"query": {"match_all": {}}})
+        response = await get_es().search(index="leetify-references", body={"query": {"match_all": {}}})
         thresholds = {}
         for hit in response['hits']['hits']:
             data = hit['_source']
@@ -14,67 +14,41 @@ async def load_leetify_thresholds():
         print(f"Error loading Leetify thresholds: {e}")
         return {}
 
-async def load_reference_tables():
-    """Load reference tables from Elasticsearch indexes"""
-    try:
-        # Load leetify tiers
-        leetify_response = await es.search(index="leetify-references", body={"query": {"match_all": {}}})
-        leetify_tiers = {}
-        for hit in leetify_response['hits']['hits']:
-            data = hit['_source']
-            leetify_tiers[data['Tier']] = (data['Lower Bound'], data['Upper Bound'])
-        
-        # Load premier references
-        premier_response = await es.search(index="premier-references", body={"query": {"match_all": {}}})
-        premier_reference = {}
-        for hit in premier_response['hits']['hits']:
-            data = hit['_source']
-            key = (data['Lower Bound'], data['Upper Bound'])
-            premier_reference[key] = {
-                'Aim': data['Aim'],
-                'Positioning': data['Positioning'],
-                'Utility': data['Utility'],
-                'accuracy_enemy_spotted': data['accuracy_enemy_spotted'],
-                'accuracy_head': data['accuracy_head'],
-                'counter_strafing_good_shots_ratio': data['counter_strafing_good_shots_ratio'],
-                'flashbang_hit_foe_avg_duration': data['flashbang_hit_foe_avg_duration'],
-                'flashbang_hit_foe_per_flashbang': data['flashbang_hit_foe_per_flashbang'],
-                'flashbang_hit_friend_per_flashbang': data['flashbang_hit_friend_per_flashbang'],
-                'flashbang_leading_to_kill': data['flashbang_leading_to_kill'],
-                'he_foes_damage_avg': data['he_foes_damage_avg'],
-                'he_friends_damage_avg': data['he_friends_damage_avg'],
-                'preaim': data['preaim'],
-                'reaction_time_ms': data['reaction_time_ms'],
-                'spray_accuracy': data['spray_accuracy'],
-                'utility_on_death_avg': data['utility_on_death_avg']
-            }
+REFERENCE_FIELDS = [
+    'accuracy_enemy_spotted', 'accuracy_head', 'counter_strafing_good_shots_ratio',
+    'flashbang_hit_foe_avg_duration', 'flashbang_hit_foe_per_flashbang',
+    'flashbang_hit_friend_per_flashbang', 'flashbang_leading_to_kill',
+    'he_foes_damage_avg', 'he_friends_damage_avg', 'preaim',
+    'reaction_time_ms', 'spray_accuracy', 'utility_on_death_avg'
+]
 
-        # Load faceit references
-        faceit_response = await es.search(index="faceit-references", body={"query": {"match_all": {}}})
-        faceit_reference = {}
-        for hit in faceit_response['hits']['hits']:
-            data = hit['_source']
-            key = (data['Lower Bound'], data['Upper Bound'])
-            faceit_reference[key] = {
-                'Aim': data['Aim'],
-                'Positioning': data['Positioning'],
-                'Utility': data['Utility'],
-                'accuracy_enemy_spotted': data['accuracy_enemy_spotted'],
-                'accuracy_head': data['accuracy_head'],
-                'counter_strafing_good_shots_ratio': data['counter_strafing_good_shots_ratio'],
-                'flashbang_hit_foe_avg_duration': data['flashbang_hit_foe_avg_duration'],
-                'flashbang_hit_foe_per_flashbang': data['flashbang_hit_foe_per_flashbang'],
-                'flashbang_hit_friend_per_flashbang': data['flashbang_hit_friend_per_flashbang'],
-                'flashbang_leading_to_kill': data['flashbang_leading_to_kill'],
-                'he_foes_damage_avg': data['he_foes_damage_avg'],
-                'he_friends_damage_avg': data['he_friends_damage_avg'],
-                'preaim': data['preaim'],
-                'reaction_time_ms': data['reaction_time_ms'],
-                'spray_accuracy': data['spray_accuracy'],
-                'utility_on_death_avg': data['utility_on_death_avg']
-            }
+def _bracket_reference(docs):
+    reference = {}
+    for data in docs:
+        key = (data['Lower Bound'], data['Upper Bound'])
+        values = {'Aim': data['Aim'], 'Positioning': data['Positioning'], 'Utility': data['Utility']}
+        for field in REFERENCE_FIELDS:
+            values[field] = data[field]
+        reference[key] = values
+    return reference
+
+def reference_tables_from_documents(leetify_docs, premier_docs, faceit_docs):
+    """Build `(premier_reference, faceit_reference, leetify_tiers)` from the indexed documents."""
+    leetify_tiers = {}
+    for data in leetify_docs:
+        leetify_tiers[data['Tier']] = (data['Lower Bound'], data['Upper Bound'])
+    return _bracket_reference(premier_docs), _bracket_reference(faceit_docs), leetify_tiers
 
-        return premier_reference, faceit_reference, leetify_tiers
+async def load_reference_tables():
+    """Load reference tables from Elasticsearch indexes.
 
+    Raises if any index cannot be read, so callers never get partial tables.
+    """
+    try:
+        docs = []
+        for index in ("leetify-references", "premier-references", "faceit-references"):
+            response = await get_es().search(index=index, body={"query": {"match_all": {}}})
+            docs.append([hit['_source'] for hit in response['hits']['hits']])
+        return reference_tables_from_documents(*docs)
     except Exception as e:
-        print(f"Error loading reference tables from Elasticsearch: {e}")
\ No newline at end of file
+        raise Exception(f"Error loading reference tables from Elasticsearch: {e}")
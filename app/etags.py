@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ETAG_REGISTRY_SIZE = int(os.getenv("ETAG_REGISTRY_SIZE", "10000"))
+
+
+def weak_etag(digest):
+    # Weak: the same content may go out gzip, brotli or identity encoded, and
+    # analyses carry percentile ranks that drift without the analysis changing
+    return f'W/"{digest}"'
+
+
+def content_etag(data):
+    """Weak ETag from a hash of the canonical JSON of `data`."""
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return weak_etag(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32])
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match or not etag:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class EtagRegistry:
+    """ETags of recently served responses, keyed by request.
+
+    Each ETag is stored with the validators of the inputs it was computed from
+    (e.g. when the cached Leetify data was fetched). While the current
+    validators still match, a conditional request can be answered with 304
+    without fetching or recomputing anything.
+    """
+
+    def __init__(self, max_size=ETAG_REGISTRY_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def remember(self, key, etag, validators):
+        if self.max_size <= 0 or validators is None:
+            return
+        self._entries[key] = (etag, validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key, validators):
+        """The stored ETag if it was computed from the same inputs, else None."""
+        entry = self._entries.get(key)
+        if entry is None or validators is None or entry[1] != validators:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+
+etag_registry = EtagRegistry()
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+from app.elastic_client import get_es, build_player_document
+from app.metrics import Gauge, CallbackCounter, Histogram, track_stage
+
+load_dotenv()
+
+INDEX_QUEUE_MAX_SIZE = int(os.getenv("INDEX_QUEUE_MAX_SIZE", "1000"))
+INDEX_FLUSH_SIZE = int(os.getenv("INDEX_FLUSH_SIZE", "50"))
+INDEX_FLUSH_INTERVAL = float(os.getenv("INDEX_FLUSH_INTERVAL", "2"))
+INDEX_ENQUEUE_TIMEOUT = float(os.getenv("INDEX_ENQUEUE_TIMEOUT", "1"))
+INDEX_MAX_RETRIES = int(os.getenv("INDEX_MAX_RETRIES", "5"))
+
+
+class IndexQueue:
+    """Write-behind queue that bulk-indexes player documents into Elasticsearch.
+
+    Documents are buffered in a bounded queue and flushed with the bulk API when
+    `flush_size` documents are waiting or `flush_interval` seconds have passed.
+    When the queue is full, `enqueue` waits up to `enqueue_timeout` seconds
+    (backpressure) before dropping the document. Failed items are retried with
+    exponential backoff, and `stop` drains whatever is left.
+    """
+
+    def __init__(self, index="player_training_data", max_size=INDEX_QUEUE_MAX_SIZE,
+                 flush_size=INDEX_FLUSH_SIZE, flush_interval=INDEX_FLUSH_INTERVAL,
+                 enqueue_timeout=INDEX_ENQUEUE_TIMEOUT, max_retries=INDEX_MAX_RETRIES):
+        self.index = index
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self._queue = None
+        self._worker = None
+        self.indexed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = None
+        self.last_flush_size = 0
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _get_queue(self):
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    async def enqueue(self, steam_id, analysis, recommendations, analysis_hash=None):
+        """Queue a player document for indexing. Returns False if it was dropped."""
+        doc = build_player_document(steam_id, analysis, recommendations, analysis_hash)
+        try:
+            await asyncio.wait_for(self._get_queue().put((steam_id, doc)), self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            print(f"Warning: index queue full, dropped document for {steam_id}")
+            return False
+
+    async def _next_batch(self):
+        queue = self._get_queue()
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch):
+        # Later documents for the same player replace earlier ones in the batch
+        pending = dict(batch)
+        started = time.perf_counter()
+        attempt = 0
+        while pending:
+            operations = []
+            for steam_id, doc in pending.items():
+                operations.append({"index": {"_index": self.index, "_id": steam_id}})
+                operations.append(doc)
+            try:
+                with track_stage("es_bulk_index"):
+                    response = await get_es().bulk(operations=operations)
+                retry = {}
+                for item, (steam_id, doc) in zip(response['items'], pending.items()):
+                    result = item.get('index', {})
+                    if result.get('error'):
+                        # Only throttling and server-side failures are worth retrying
+                        if result.get('status', 500) in (429, 500, 502, 503, 504):
+                            retry[steam_id] = doc
+                        else:
+                            self.failed += 1
+                            print(f"Elasticsearch indexing failed for {steam_id}: {result['error']}")
+                    else:
+                        self.indexed += 1
+                pending = retry
+            except Exception as e:
+                print(f"Elasticsearch bulk indexing failed: {e}")
+            if not pending:
+                break
+            attempt += 1
+            if attempt > self.max_retries:
+                self.failed += len(pending)
+                print(f"Giving up on indexing {len(pending)} documents after {self.max_retries} retries")
+                break
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+        self.flushes += 1
+        self.last_flush_size = len(batch)
+        self.last_flush_seconds = time.perf_counter() - started
+        INDEX_FLUSH_DURATION.observe(self.last_flush_seconds)
+
+    async def _run(self):
+        queue = self._get_queue()
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def start(self):
+        if self._worker is None:
+            self._get_queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=30.0):
+        """Flush everything still queued, then stop the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._get_queue().join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: index queue drain timed out with {self.depth} documents left")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+index_queue = IndexQueue()
+
+INDEX_FLUSH_DURATION = Histogram("cs2_index_flush_duration_seconds", "Time to flush one batch, retries included")
+Gauge("cs2_index_queue_depth", "Documents waiting in the write-behind index queue", callback=lambda: index_queue.depth)
+CallbackCounter("cs2_index_documents_indexed_total", "Documents indexed by the write-behind queue", callback=lambda: index_queue.indexed)
+CallbackCounter("cs2_index_documents_failed_total", "Documents that failed to index", callback=lambda: index_queue.failed)
+CallbackCounter("cs2_index_documents_dropped_total", "Documents dropped because the queue was full", callback=lambda: index_queue.dropped)
@@ -0,0 +1,63 @@
+import bisect
+
+
+class IntervalIndex:
+    """Sorted, bisect-based lookup over closed `(low, high)` intervals.
+
+    Built once from `{(low, high): value}` pairs. `find` runs in O(log n) for
+    disjoint intervals. Gaps and overlaps are detected at build time; `step` is
+    the resolution of the looked-up values, so `(0, 4999)` followed by
+    `(5000, 9999)` is contiguous with `step=1`.
+    """
+
+    def __init__(self, intervals, fallback=None, step=0):
+        entries = sorted(intervals, key=lambda item: item[0])
+        self._keys = [key for key, _ in entries]
+        self._lows = [low for low, _ in self._keys]
+        self._highs = [high for _, high in self._keys]
+        self._values = [value for _, value in entries]
+        self._by_key = dict(entries)
+
+        # Running max of the upper bounds lets `find` stop early when no
+        # interval at or before the bisect position can contain the value
+        self._max_highs = []
+        running = None
+        for high in self._highs:
+            running = high if running is None else max(running, high)
+            self._max_highs.append(running)
+
+        self.gaps = []
+        self.overlaps = []
+        for i in range(1, len(self._keys)):
+            previous_high = self._max_highs[i - 1]
+            low = self._lows[i]
+            if low <= previous_high:
+                self.overlaps.append((self._keys[i - 1], self._keys[i]))
+            elif low - previous_high > step + 1e-9:
+                self.gaps.append((previous_high, low))
+
+        self.fallback = None
+        if fallback is not None and fallback in self._by_key:
+            self.fallback = (fallback, self._by_key[fallback])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __bool__(self):
+        return bool(self._keys)
+
+    def find(self, value):
+        """Return `((low, high), item)` for the interval containing `value`, or None."""
+        i = bisect.bisect_right(self._lows, value) - 1
+        if i < 0 or self._max_highs[i] < value:
+            return None
+        # Disjoint intervals resolve on the first check; overlapping ones walk back
+        while i >= 0 and self._max_highs[i] >= value:
+            if self._highs[i] >= value:
+                return self._keys[i], self._values[i]
+            i -= 1
+        return None
+
+    def get(self, key):
+        """Direct lookup of an exact `(low, high)` key."""
+        return self._by_key.get(key)
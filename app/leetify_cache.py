@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.metrics import Gauge, CallbackCounter
+
+load_dotenv()
+
+LEETIFY_CACHE_MAX_BYTES = int(os.getenv("LEETIFY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LEETIFY_CACHE_MIN_TTL = float(os.getenv("LEETIFY_CACHE_MIN_TTL", "300"))
+LEETIFY_CACHE_MAX_TTL = float(os.getenv("LEETIFY_CACHE_MAX_TTL", "3600"))
+LEETIFY_CACHE_DIR = os.getenv("LEETIFY_CACHE_DIR")
+LEETIFY_MATCH_HISTORY_LIMIT = int(os.getenv("LEETIFY_MATCH_HISTORY_LIMIT", "2000"))
+
+
+class CacheEntry:
+    __slots__ = ("data", "size", "fetched_at", "ttl", "etag", "last_modified")
+
+    def __init__(self, data, size, fetched_at, ttl, etag=None, last_modified=None):
+        self.data = data
+        self.size = size
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self):
+        return time.time() - self.fetched_at < self.ttl
+
+    def to_json(self):
+        return {
+            "data": self.data,
+            "fetched_at": self.fetched_at,
+            "ttl": self.ttl,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+        }
+
+
+def merge_matches(cached, fresh):
+    """Merge upstream matches newer than the newest cached one into the history.
+
+    Returns `(matches, changed)`. History is kept newest first, so matches that
+    have aged out of Leetify's window stay available until the history limit.
+    """
+    if not cached:
+        return fresh, True
+    newest_seen = max((m.get("finished_at") or "" for m in cached), default="")
+    seen_ids = {m.get("id") for m in cached}
+    new = [m for m in fresh
+           if m.get("id") not in seen_ids and (m.get("finished_at") or "") > newest_seen]
+    if not new:
+        return cached, False
+    new.sort(key=lambda m: m.get("finished_at") or "", reverse=True)
+    return (new + cached)[:LEETIFY_MATCH_HISTORY_LIMIT], True
+
+
+class LeetifyCache:
+    """LRU cache of Leetify responses with per-player TTLs.
+
+    Entries are evicted least recently used first once the approximate payload
+    size passes `max_bytes`. Each player's TTL starts at `min_ttl`, doubles
+    every time a refresh finds nothing new (up to `max_ttl`) and resets when
+    the data changes, so active players refresh often and idle ones rarely.
+    With `disk_dir` set, entries are also written to disk and survive restarts.
+    """
+
+    def __init__(self, max_bytes=LEETIFY_CACHE_MAX_BYTES, min_ttl=LEETIFY_CACHE_MIN_TTL,
+                 max_ttl=LEETIFY_CACHE_MAX_TTL, disk_dir=LEETIFY_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, kind, steam_id):
+        if not self.disk_dir or not str(steam_id).isalnum():
+            return None
+        return os.path.join(self.disk_dir, f"{kind}_{steam_id}.json")
+
+    def _read_disk(self, path):
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(stored["data"], size, stored["fetched_at"], stored["ttl"],
+                          stored.get("etag"), stored.get("last_modified"))
+
+    def _write_disk(self, path, entry):
+        # A unique temp file per writer: concurrent puts and other workers share the directory
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry.to_json(), f)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except OSError as e:
+            print(f"Warning: could not write Leetify cache file {path}: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def _remember(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size
+        if self.max_bytes <= 0 or entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+    async def get(self, kind, steam_id):
+        """Return the cached entry (fresh or stale), checking memory then disk."""
+        key = (kind, steam_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            path = self._disk_path(kind, steam_id)
+            if path and os.path.exists(path):
+                entry = await asyncio.to_thread(self._read_disk, path)
+                if entry is not None:
+                    self._remember(key, entry)
+        else:
+            self._entries.move_to_end(key)
+        if entry is not None and entry.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def peek(self, kind, steam_id):
+        """The in-memory entry if it is still fresh, without touching stats, LRU order or disk."""
+        entry = self._entries.get((kind, steam_id))
+        return entry if entry is not None and entry.fresh else None
+
+    async def put(self, kind, steam_id, data, size, previous=None, changed=True,
+                  etag=None, last_modified=None):
+        """Store a refreshed response, adapting the player's TTL to whether it changed."""
+        if previous is None or changed:
+            ttl = self.min_ttl
+        else:
+            ttl = min(previous.ttl * 2, self.max_ttl)
+        entry = CacheEntry(data, size, time.time(), ttl, etag, last_modified)
+        self._remember((kind, steam_id), entry)
+        path = self._disk_path(kind, steam_id)
+        if path:
+            await asyncio.to_thread(self._write_disk, path, entry)
+        return entry
+
+    async def revalidated(self, kind, steam_id, entry):
+        """Upstream confirmed the entry is unchanged (304): extend it."""
+        self.revalidations += 1
+        return await self.put(kind, steam_id, entry.data, entry.size, previous=entry, changed=False,
+                              etag=entry.etag, last_modified=entry.last_modified)
+
+
+leetify_cache = LeetifyCache()
+
+Gauge("cs2_leetify_cache_bytes", "Approximate size of cached Leetify responses", callback=lambda: leetify_cache.bytes)
+CallbackCounter("cs2_leetify_cache_hits_total", "Leetify responses served from cache within TTL", callback=lambda: leetify_cache.hits)
+CallbackCounter("cs2_leetify_cache_misses_total", "Leetify lookups that needed an upstream request", callback=lambda: leetify_cache.misses)
+CallbackCounter("cs2_leetify_cache_revalidations_total", "Upstream 304 responses that extended a cached entry", callback=lambda: leetify_cache.revalidations)
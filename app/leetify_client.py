@@ -1,32 +1,216 @@
 import os
+import asyncio
+import json
+import math
+import time
 import requests
 import httpx
 from dotenv import load_dotenv
+from app.metrics import Gauge, Histogram, track_stage
+from app.rate_limiter import AdaptiveLimiter, RateLimitExceeded, backoff_delay, parse_retry_after
+from app.leetify_cache import leetify_cache, merge_matches
 
 load_dotenv()
 
 API_KEY = os.getenv("LEETIFY_API_KEY")
 
-BASE_URL = "https://api-public.cs-prod.leetify.com"
+BASE_URL = os.getenv("LEETIFY_BASE_URL") or "https://api-public.cs-prod.leetify.com"
 HEADERS = {
     "Accept": "application/json",
     "_leetify_key": API_KEY
     }
 
+LEETIFY_TIMEOUT = float(os.getenv("LEETIFY_TIMEOUT", "10"))
+LEETIFY_CONNECT_TIMEOUT = float(os.getenv("LEETIFY_CONNECT_TIMEOUT", "5"))
+LEETIFY_MAX_CONNECTIONS = int(os.getenv("LEETIFY_MAX_CONNECTIONS", "50"))
+LEETIFY_MAX_KEEPALIVE = int(os.getenv("LEETIFY_MAX_KEEPALIVE", "20"))
+LEETIFY_RATE_LIMIT = float(os.getenv("LEETIFY_RATE_LIMIT", "10"))
+LEETIFY_BURST = int(os.getenv("LEETIFY_BURST", "20"))
+LEETIFY_MAX_CONCURRENCY = int(os.getenv("LEETIFY_MAX_CONCURRENCY", "20"))
+LEETIFY_QUEUE_TIMEOUT = float(os.getenv("LEETIFY_QUEUE_TIMEOUT", "15"))
+LEETIFY_MAX_RETRIES = int(os.getenv("LEETIFY_MAX_RETRIES", "3"))
+
+LEETIFY_QUEUE_WAIT = Histogram("cs2_leetify_queue_wait_seconds", "Time Leetify calls waited for a rate limit slot")
+
+# Every call to Leetify, async or sync, goes through this limiter
+leetify_limiter = AdaptiveLimiter(
+    LEETIFY_RATE_LIMIT, LEETIFY_BURST, LEETIFY_MAX_CONCURRENCY,
+    on_wait=LEETIFY_QUEUE_WAIT.observe,
+)
+
+Gauge("cs2_leetify_concurrency_limit", "Current adaptive Leetify concurrency limit", callback=lambda: leetify_limiter.limit)
+Gauge("cs2_leetify_in_flight", "Leetify calls currently in flight", callback=lambda: leetify_limiter.in_flight)
+
+
+class LeetifyRateLimitError(Exception):
+    """Leetify kept throttling us, or the queue deadline passed first."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Shared across requests so connections (and TLS sessions) are reused
+_async_client = None
+
+def get_async_client():
+    """Return the shared pooled client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=HEADERS,
+            timeout=httpx.Timeout(LEETIFY_TIMEOUT, connect=LEETIFY_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LEETIFY_MAX_CONNECTIONS,
+                max_keepalive_connections=LEETIFY_MAX_KEEPALIVE,
+            ),
+        )
+    return _async_client
+
+async def close_async_client():
+    """Close the shared client. Called from the app lifespan on shutdown."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _retry_delay(response, attempt, deadline):
+    """Seconds to wait before retrying a throttled (429/503) or failed (None) call.
+
+    A Retry-After pauses every caller; without one, jittered exponential
+    backoff is used. Raises LeetifyRateLimitError once throttling outlasts the
+    retries or the queue deadline.
+    """
+    retry_after = parse_retry_after(response.headers.get("retry-after")) if response is not None else None
+    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+    if retry_after is not None:
+        leetify_limiter.bucket.pause(retry_after)
+    if response is not None and (attempt >= LEETIFY_MAX_RETRIES or time.monotonic() + delay > deadline):
+        raise LeetifyRateLimitError(
+            f"Leetify API Error {response.status_code}: rate limited, retry after {math.ceil(delay)}s",
+            retry_after=delay,
+        )
+    return delay
+
+async def _request_with_limits(path: str, steam_id: str, stage: str, headers: dict):
+    """Send one Leetify GET through the limiter, retrying throttling and transport errors.
+
+    Requests queue for a slot until LEETIFY_QUEUE_TIMEOUT instead of failing
+    outright. 429/503 responses honour Retry-After (pausing every caller) and
+    fall back to jittered exponential backoff.
+    """
+    deadline = time.monotonic() + LEETIFY_QUEUE_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            await leetify_limiter.acquire(deadline)
+        except RateLimitExceeded as e:
+            raise LeetifyRateLimitError(f"Leetify API Error 429: {e}", retry_after=e.retry_after)
+
+        response = None
+        try:
+            with track_stage(stage):
+                response = await get_async_client().get(path, params={"steam64_id": steam_id}, headers=headers)
+        except httpx.TransportError as e:
+            if attempt >= LEETIFY_MAX_RETRIES:
+                raise Exception(f"Leetify API Error: {e}")
+        finally:
+            # A call without a response (transport error, cancellation) must not grow the limit
+            throttled = response is not None and response.status_code in (429, 503)
+            await leetify_limiter.release(throttled=throttled, failed=response is None)
+
+        if response is not None and not throttled:
+            return response
+        delay = _retry_delay(response, attempt, deadline)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+def _request_with_limits_blocking(path: str, steam_id: str):
+    """`_request_with_limits` for the synchronous helpers, with the same limiter and retry policy."""
+    deadline = time.monotonic() + LEETIFY_QUEUE_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            leetify_limiter.acquire_blocking(deadline)
+        except RateLimitExceeded as e:
+            raise LeetifyRateLimitError(f"Leetify API Error 429: {e}", retry_after=e.retry_after)
+
+        response = None
+        try:
+            response = requests.get(f"{BASE_URL}{path}", params={"steam64_id": steam_id}, headers=HEADERS,
+                                    timeout=(LEETIFY_CONNECT_TIMEOUT, LEETIFY_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= LEETIFY_MAX_RETRIES:
+                raise Exception(f"Leetify API Error: {e}")
+        finally:
+            throttled = response is not None and response.status_code in (429, 503)
+            leetify_limiter.release_blocking(throttled=throttled, failed=response is None)
+
+        if response is not None and not throttled:
+            return response
+        delay = _retry_delay(response, attempt, deadline)
+        attempt += 1
+        time.sleep(delay)
+
+async def _get_json(path: str, steam_id: str, stage: str, kind: str):
+    """GET a Leetify endpoint through the response cache.
+
+    Fresh cache entries are returned without a request. Stale ones are
+    revalidated with the stored ETag/Last-Modified, and match lists are merged
+    incrementally so only matches newer than the last one seen are added.
+    """
+    cached = await leetify_cache.get(kind, steam_id)
+    if cached is not None and cached.fresh:
+        return cached.data
+
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    response = await _request_with_limits(path, steam_id, stage, headers)
+
+    if response.status_code == 304 and cached is not None:
+        await leetify_cache.revalidated(kind, steam_id, cached)
+        return cached.data
+    if response.status_code != 200:
+        raise Exception(f"Leetify API Error {response.status_code}: {response.text}")
+
+    data = response.json()
+    size = len(response.content)
+    if kind == "matches" and cached is not None:
+        data, changed = merge_matches(cached.data, data)
+        # Merged history outgrows the upstream payload, so measure it directly
+        size = len(json.dumps(data, separators=(",", ":"))) if changed else cached.size
+    else:
+        changed = cached is None or data != cached.data
+
+    await leetify_cache.put(kind, steam_id, data, size, previous=cached, changed=changed,
+                            etag=response.headers.get("etag"),
+                            last_modified=response.headers.get("last-modified"))
+    return data
+
+async def fetch_player_profile(steam_id: str):
+    """Asynchronously fetch player profile information using Leetify's v3 API."""
+    return await _get_json("/v3/profile", steam_id, "leetify_profile", "profile")
+
+async def fetch_player_matches(steam_id: str):
+    """Asynchronously fetch recent matches for a player using Leetify's v3 API."""
+    return await _get_json("/v3/profile/matches", steam_id, "leetify_matches", "matches")
+
 async def get_player_data(steam_id: str):
     """Asynchronously fetch player profile information and match history using Leetify's v3 API."""
-    async with httpx.AsyncClient() as client:
-        url_profile = f"{BASE_URL}/v3/profile?steam64_id={steam_id}"
-        url_matches = f"{BASE_URL}/v3/profile/matches?steam64_id={steam_id}"
-        profile = (await client.get(url_profile, headers=HEADERS)).json()
-        matches = (await client.get(url_matches, headers=HEADERS)).json()
-        return profile, matches
+    profile, matches = await asyncio.gather(
+        fetch_player_profile(steam_id),
+        fetch_player_matches(steam_id),
+    )
+    return profile, matches
 
 def get_player_profile(steam_id: str):
     """Fetch player profile information using Leetify's v3 API."""
-    url_player = f"{BASE_URL}/v3/profile?steam64_id={steam_id}"
-
-    response = requests.get(url_player, headers=HEADERS, timeout=10)
+    response = _request_with_limits_blocking("/v3/profile", steam_id)
     if response.status_code == 200:
         return response.json()
     else:
@@ -34,11 +218,8 @@ def get_player_profile(steam_id: str):
 
 def get_player_matches(steam_id: str):
     """Fetch recent matches for a player using Leetify's v3 API."""
-    url_matches = f"{BASE_URL}/v3/profile/matches?steam64_id={steam_id}"
-
-    response = requests.get(url_matches, headers=HEADERS, timeout=10)
+    response = _request_with_limits_blocking("/v3/profile/matches", steam_id)
     if response.status_code == 200:
         return response.json()
     else:
         raise Exception(f"Leetify API Error {response.status_code}: {response.text}")
-    
\ No newline at end of file
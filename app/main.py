@@ -1,14 +1,66 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import json
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.leetify_client import get_player_profile, get_player_matches, get_player_data
-from app.elastic_client import index_player_data
-from app.vertex_client import generate_recommendations
-from app.data_processing import analyze_player_data
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from app.leetify_client import (
+    fetch_player_profile, fetch_player_matches, get_player_data, close_async_client, LeetifyRateLimitError
+)
+from app.index_queue import index_queue
+from app.elastic_client import close_es
+from app.data_processing import analyze_player_data, build_analysis
+from app.vertex_client import generate_team_recommendations
+from app.reference_store import reference_store
+from app.percentile_index import percentile_index
+from app.warmup import warmup
+from app.precompute import precompute_scheduler, TrackedPlayersFullError
+from app.single_flight import SingleFlight
+from app.metrics import SERVER_TIMING_ENABLED, ServerTimingMiddleware, render as render_metrics
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware
+from app.etags import etag_registry, content_etag, etag_matches
+from app.leetify_cache import leetify_cache
+from app.recommendation_cache import (
+    recommendation_cache, analysis_hash, get_or_generate_recommendations, stream_or_replay_recommendations
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are created lazily; warm-up runs in the background so the
+    # server accepts /health right away and /ready reports when it is hot
+    await reference_store.start(preload=False)
+    index_queue.start()
+    percentile_index.start()
+    warmup.start()
+    precompute_scheduler.start()
+    yield
+    await precompute_scheduler.stop()
+    await warmup.stop()
+    await percentile_index.stop()
+    await index_queue.stop()
+    await reference_store.stop()
+    await close_async_client()
+    await close_es()
+
+BATCH_MAX_PLAYERS = int(os.getenv("BATCH_MAX_PLAYERS", "25"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "5"))
+MATCHES_MAX_PAGE_SIZE = int(os.getenv("MATCHES_MAX_PAGE_SIZE", "200"))
+# Shared secret for the endpoints that change server state; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Concurrent /analyze requests for the same Steam ID share one computation
+analysis_flight = SingleFlight()
 
 app = FastAPI(
     title="CS2 Training Recommender",
     version="1.0",
-    description="AI-driven CS2 training"
+    description="AI-driven CS2 training",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -18,8 +70,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Clients must revalidate, which lets the browser cache send If-None-Match
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+def _validators(steam_id: str, *kinds: str):
+    """What a response was computed from: the cached Leetify entries and reference tables.
+
+    None when any Leetify entry is missing or stale, since the data may then
+    have changed upstream.
+    """
+    fetched = []
+    for kind in kinds:
+        entry = leetify_cache.peek(kind, steam_id)
+        if entry is None:
+            return None
+        fetched.append(entry.fetched_at)
+    return tuple(fetched) + (reference_store.loaded_at,)
+
+def _not_modified(request: Request, key, validators):
+    """A 304 if the client's ETag is still current for `key`, without recomputing anything."""
+    etag = etag_registry.lookup(key, validators)
+    if etag is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL})
+    return None
+
+def _conditional(request: Request, key, validator_kinds, steam_id: str, body, etag: str):
+    """Remember the ETag of a computed body and send it, or a 304 if the client already has it."""
+    etag_registry.remember(key, etag, _validators(steam_id, *validator_kinds))
+    headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Only let requests carrying the ADMIN_TOKEN in X-Admin-Token through."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+def _http_error(e: Exception):
+    """Map pipeline failures to HTTP errors; Leetify throttling becomes a 429 with Retry-After."""
+    if isinstance(e, LeetifyRateLimitError):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after is not None else None
+        return HTTPException(status_code=429, detail=str(e), headers=headers)
+    if isinstance(e, TrackedPlayersFullError):
+        return HTTPException(status_code=409, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
 @app.get("/")
 async def root():
     return {"message": "CS2 Training Recommender API"}
@@ -28,36 +135,225 @@ async def root():
 def health_check():
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/ready")
+def readiness_check():
+    """503 until warm-up has finished and the reference tables are loaded."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics for every pipeline stage, the caches and the index queue."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.post("/reference-tables/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_reference_tables():
+    """Force a background reload of the cached reference tables."""
+    reference_store.invalidate()
+    return {"status": "refreshing"}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters for the AI recommendation cache."""
+    return {"recommendations": recommendation_cache.stats()}
+
+async def _run_analysis(steam_id: str):
+    player_profile, match_data = await get_player_data(steam_id)
+    analysis = await analyze_player_data(player_profile, match_data, steam_id, save_json=False)
+    percentile_index.annotate(steam_id, analysis)
+    cache_key = analysis_hash(analysis)
+    ai_suggestions = await get_or_generate_recommendations(analysis, cache_key)
+    # Written behind by the bulk index queue so the response does not wait on ES
+    await index_queue.enqueue(steam_id, analysis, ai_suggestions, analysis_hash=cache_key)
+    return {"analysis": analysis, "recommendations": ai_suggestions}
+
+@app.get("/index-queue/stats")
+def index_queue_stats():
+    """Depth and flush latency of the write-behind Elasticsearch queue."""
+    return index_queue.stats()
+
+@app.get("/tracked-players")
+def list_tracked_players():
+    """Players whose analysis is precomputed in the background, plus scheduler stats."""
+    return {"steam_ids": sorted(precompute_scheduler.tracked), "stats": precompute_scheduler.stats()}
+
+@app.put("/tracked-players/{steam_id}", dependencies=[Depends(require_admin)])
+async def track_player(steam_id: str):
+    try:
+        await precompute_scheduler.track(steam_id)
+    except Exception as e:
+        raise _http_error(e)
+    return {"status": "tracked", "steam_id": steam_id}
+
+@app.delete("/tracked-players/{steam_id}", dependencies=[Depends(require_admin)])
+async def untrack_player(steam_id: str):
+    try:
+        await precompute_scheduler.untrack(steam_id)
+    except Exception as e:
+        raise _http_error(e)
+    return {"status": "untracked", "steam_id": steam_id}
+
+class BatchAnalyzeRequest(BaseModel):
+    steam_ids: List[str]
+    team_summary: bool = False
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """Analyze a roster, streaming one NDJSON line per player as each one finishes."""
+    steam_ids = list(dict.fromkeys(request.steam_ids))
+    if not steam_ids:
+        raise HTTPException(status_code=400, detail="No Steam IDs given")
+    if len(steam_ids) > BATCH_MAX_PLAYERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_PLAYERS} Steam IDs per batch")
+
+    try:
+        # One snapshot of the reference tables for the whole batch
+        tables = await reference_store.get()
+    except Exception as e:
+        print(f"Error in analyze_batch: {str(e)}")
+        raise _http_error(e)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def analyze_one(steam_id):
+        try:
+            async with semaphore:
+                player_profile, match_data = await get_player_data(steam_id)
+            # Batch analyses are not indexed, so they are ranked but not added
+            analysis = build_analysis(player_profile, tables, match_data, steam_id)
+            return steam_id, percentile_index.annotate(steam_id, analysis, observe=False), None
+        except Exception as e:
+            return steam_id, None, str(e)
+
+    async def lines():
+        tasks = [asyncio.create_task(analyze_one(steam_id)) for steam_id in steam_ids]
+        analyses = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                steam_id, analysis, error = await next_done
+                if error is not None:
+                    yield json.dumps({"steam_id": steam_id, "error": error}) + "\n"
+                else:
+                    analyses[steam_id] = analysis
+                    yield json.dumps({"steam_id": steam_id, "analysis": analysis}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if request.team_summary and analyses:
+            try:
+                team_recommendations = await generate_team_recommendations(analyses)
+                yield json.dumps({"team_recommendations": team_recommendations}) + "\n"
+            except Exception as e:
+                print(f"Error in analyze_batch: {str(e)}")
+                yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/analyze/{steam_id}")
-async def analyze_player(steam_id: str):
+async def analyze_player(steam_id: str, request: Request):
+    key = ("analyze", steam_id)
+    # Tracked players are served from the background precompute when it is recent enough
+    result = await precompute_scheduler.get(steam_id)
+    if result is None:
+        not_modified = _not_modified(request, key, _validators(steam_id, "profile", "matches"))
+        if not_modified is not None:
+            return not_modified
+        try:
+            result = await analysis_flight.do(steam_id, lambda: _run_analysis(steam_id))
+        except Exception as e:
+            print(f"Error in analyze_player: {str(e)}")
+            raise _http_error(e)
+    # analysis_hash leaves out the drifting percentiles
+    etag = content_etag([analysis_hash(result["analysis"]), result["recommendations"]])
+    return _conditional(request, key, ("profile", "matches"), steam_id, result, etag)
+
+def _sse(event: str, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/analyze/{steam_id}/stream")
+async def analyze_player_stream(steam_id: str):
+    """Send the numeric analysis right away, then stream recommendation tokens as SSE."""
     try:
         player_profile, match_data = await get_player_data(steam_id)
         analysis = await analyze_player_data(player_profile, match_data, steam_id, save_json=False)
-        ai_suggestions = await generate_recommendations(analysis)
-        await index_player_data(steam_id, analysis, ai_suggestions)
-        return {"analysis": analysis, "recommendations": ai_suggestions}
+        percentile_index.annotate(steam_id, analysis)
+        cache_key = analysis_hash(analysis)
     except Exception as e:
-        print(f"Error in analyze_player: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Error in analyze_player_stream: {str(e)}")
+        raise _http_error(e)
+
+    async def events():
+        yield _sse("analysis", analysis)
+        chunks = []
+        try:
+            async for chunk in stream_or_replay_recommendations(analysis, cache_key):
+                chunks.append(chunk)
+                yield _sse("token", chunk)
+        except Exception as e:
+            print(f"Error in analyze_player_stream: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        recommendations = "".join(chunks)
+        yield _sse("done", {"recommendations": recommendations})
+        await index_queue.enqueue(steam_id, analysis, recommendations, analysis_hash=cache_key)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/player/{steam_id}/profile")
-def fetch_profile(steam_id: str):
+async def fetch_profile(steam_id: str):
     """Fetch player profile stats (rank, rating, etc.)."""
     try:
-        profile = get_player_profile(steam_id)
+        profile = await fetch_player_profile(steam_id)
         return {"status": "success", "profile": profile}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+def _paginate(matches: list, limit: Optional[int], cursor: Optional[str]):
+    """Slice the newest-first history after the match with id `cursor`.
+
+    Returns `(page, next_cursor)`. The cursor is a match id rather than an
+    offset, so pages stay stable when new matches are added at the front.
+    """
+    start = 0
+    if cursor is not None:
+        ids = [str(m.get("id")) for m in matches]
+        if cursor not in ids:
+            raise HTTPException(status_code=400, detail="Unknown cursor")
+        start = ids.index(cursor) + 1
+    if limit is None:
+        return matches[start:], None
+    page = matches[start:start + limit]
+    more = start + limit < len(matches)
+    return page, (str(page[-1].get("id")) if more and page else None)
 
 @app.get("/player/{steam_id}/matches")
-def fetch_and_store_matches(steam_id: str):
-    """Fetch full match history from Leetify, store it in Elastic, and return it."""
+async def fetch_and_store_matches(
+    steam_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MATCHES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Fetch match history from Leetify and return it, optionally one page at a time."""
+    key = ("matches", steam_id, limit, cursor)
+    not_modified = _not_modified(request, key, _validators(steam_id, "matches"))
+    if not_modified is not None:
+        return not_modified
     try:
-        matches = get_player_matches(steam_id)
-        return {
-            "status": "success",
-            "matches_indexed": len(matches),
-            "matches": matches  # return full JSON array like your example
-        }
+        matches = await fetch_player_matches(steam_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise _http_error(e)
+    page, next_cursor = _paginate(matches, limit, cursor)
+    body = {
+        "status": "success",
+        "matches_indexed": len(page),
+        "total_matches": len(matches),
+        "next_cursor": next_cursor,
+        "matches": page,
+    }
+    return _conditional(request, key, ("matches",), steam_id, body, content_etag(body))
\ No newline at end of file
@@ -0,0 +1,134 @@
+import math
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROLLING_WINDOW = int(os.getenv("TRENDS_ROLLING_WINDOW", "10"))
+RECENT_MATCHES = int(os.getenv("TRENDS_RECENT_MATCHES", "20"))
+ROLLING_POINTS = int(os.getenv("TRENDS_ROLLING_POINTS", "20"))
+
+# Per-match stats do not always use the profile field names; (field, scale) candidates per metric
+MATCH_FIELD_ALIASES = {
+    "counter_strafing_good_shots_ratio": [
+        ("counter_strafing_good_shots_ratio", 1.0),
+        ("counter_strafing_shots_good_ratio", 1.0),
+    ],
+    "reaction_time_ms": [("reaction_time_ms", 1.0), ("reaction_time", 1000.0)],
+}
+
+
+def _player_stats(match, steam_id):
+    stats = match.get("stats")
+    if isinstance(stats, list):
+        for entry in stats:
+            if str(entry.get("steam64_id")) == str(steam_id):
+                return entry
+        return None
+    return stats if isinstance(stats, dict) else None
+
+
+def load_match_columns(matches, steam_id, metrics):
+    """Load per-match stats into columnar arrays, oldest match first.
+
+    Returns `(values, map_names)` where `values` is an `(n_matches, n_metrics)`
+    float array with NaN for missing stats.
+    """
+    rows = []
+    finished = []
+    map_names = []
+    for match in matches or []:
+        stats = _player_stats(match, steam_id)
+        if stats is None:
+            continue
+        rows.append(stats)
+        finished.append(match.get("finished_at") or "")
+        map_names.append(match.get("map_name") or "unknown")
+
+    values = np.full((len(rows), len(metrics)), np.nan)
+    for j, metric in enumerate(metrics):
+        for field, scale in MATCH_FIELD_ALIASES.get(metric, [(metric, 1.0)]):
+            column = np.array([row.get(field, np.nan) for row in rows], dtype=float) * scale
+            values[:, j] = np.where(np.isnan(values[:, j]), column, values[:, j])
+
+    # ISO timestamps sort lexicographically
+    order = np.argsort(np.array(finished, dtype=str), kind="stable")
+    return values[order], np.array(map_names, dtype=str)[order]
+
+
+def _round(value, digits=3):
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+
+def compute_match_trends(matches, steam_id, metrics,
+                         window=ROLLING_WINDOW, recent=RECENT_MATCHES, points=ROLLING_POINTS):
+    """Rolling averages, recent-vs-lifetime deltas, trend slopes and per-map splits.
+
+    Every statistic is computed for all metrics at once over the columnar
+    arrays; missing values are masked rather than dropped row by row.
+    """
+    values, map_names = load_match_columns(matches, steam_id, metrics)
+    n = values.shape[0]
+    if n == 0:
+        return None
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = valid.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lifetime = filled.sum(axis=0) / counts
+        recent_rows = slice(max(0, n - recent), n)
+        recent_avg = filled[recent_rows].sum(axis=0) / valid[recent_rows].sum(axis=0)
+
+        # Rolling mean from cumulative sums; windows with no data stay NaN
+        w = min(window, n)
+        csum = np.vstack([np.zeros(len(metrics)), np.cumsum(filled, axis=0)])
+        ccount = np.vstack([np.zeros(len(metrics)), np.cumsum(valid, axis=0)])
+        rolling = (csum[w:] - csum[:-w]) / (ccount[w:] - ccount[:-w])
+
+        # Least-squares slope per metric against chronological match index
+        x = np.arange(n, dtype=float)[:, None]
+        sx = (x * valid).sum(axis=0)
+        sxx = (x * x * valid).sum(axis=0)
+        sxy = (x * filled).sum(axis=0)
+        sy = filled.sum(axis=0)
+        slope = (counts * sxy - sx * sy) / (counts * sxx - sx * sx)
+
+        map_keys, map_codes = np.unique(map_names, return_inverse=True)
+        map_sums = np.zeros((len(map_keys), len(metrics)))
+        map_valid = np.zeros((len(map_keys), len(metrics)))
+        np.add.at(map_sums, map_codes, filled)
+        np.add.at(map_valid, map_codes, valid)
+        map_avg = map_sums / map_valid
+    map_matches = np.bincount(map_codes, minlength=len(map_keys))
+
+    trends = {}
+    for j, metric in enumerate(metrics):
+        if counts[j] == 0:
+            continue
+        trends[metric] = {
+            "lifetime": _round(lifetime[j]),
+            "recent": _round(recent_avg[j]),
+            "delta": _round(recent_avg[j] - lifetime[j]),
+            "trend_slope": _round(slope[j], 4),
+            "rolling_avg": [_round(v) for v in rolling[-points:, j]],
+        }
+
+    maps = {}
+    for i, map_name in enumerate(map_keys):
+        maps[str(map_name)] = {
+            "matches": int(map_matches[i]),
+            "averages": {metric: _round(map_avg[i, j])
+                         for j, metric in enumerate(metrics) if map_valid[i, j] > 0},
+        }
+
+    return {
+        "matches_analyzed": int(n),
+        "rolling_window": int(w),
+        "recent_matches": int(min(recent, n)),
+        "metrics": trends,
+        "maps": maps,
+    }
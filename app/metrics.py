@@ -0,0 +1,196 @@
+import bisect
+import contextvars
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# All metrics register themselves here; /metrics renders them in order
+REGISTRY = []
+
+# Per-request list of (stage, seconds) for the Server-Timing header
+_server_timing = contextvars.ContextVar("server_timing", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally labelled.
+
+    Updates happen on the event loop, so plain dict arithmetic is enough.
+    """
+
+    type = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    """Value that can go up and down. With `callback`, it is read at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, callback=None):
+        super().__init__(name, help)
+        self.callback = callback
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self._values[_label_key(labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            if value is not None:
+                yield self.name, (), value
+            return
+        yield from super().samples()
+
+
+class CallbackCounter(Gauge):
+    """Counter whose value is owned elsewhere and read at scrape time."""
+
+    type = "counter"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # Per-bucket counts, then sum and count
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key + (("le", bound),), cumulative
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), count
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_DURATION = Histogram("cs2_stage_duration_seconds", "Time spent in each analysis pipeline stage")
+STAGE_ERRORS = Counter("cs2_stage_errors_total", "Pipeline stage calls that raised")
+STAGE_IN_FLIGHT = Gauge("cs2_stage_in_flight", "Pipeline stage calls currently running")
+
+
+class track_stage:
+    """Time a pipeline stage: `with track_stage("gemini_generate"): ...`
+
+    Works around awaits inside async code. Records a histogram sample, the
+    in-flight gauge, errors, and the request's Server-Timing entry.
+    """
+
+    __slots__ = ("stage", "_started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        STAGE_IN_FLIGHT.inc(stage=self.stage)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        STAGE_IN_FLIGHT.dec(stage=self.stage)
+        STAGE_DURATION.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        timings = _server_timing.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a `Server-Timing` header with the stages a request ran.
+
+    Only stages that finished before the response started are reported, so
+    streaming endpoints list the work done before their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _server_timing.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings:
+                value = ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _server_timing.reset(token)
@@ -0,0 +1,410 @@
+import asyncio
+import bisect
+import json
+import os
+import struct
+import tempfile
+import time
+import numpy as np
+from dotenv import load_dotenv
+from app.data_processing import DETAILED_METRICS, LOWER_IS_BETTER_METRICS
+from app.elastic_client import get_es
+from app.metrics import Gauge, track_stage
+
+load_dotenv()
+
+PERCENTILE_INDEX_PATH = os.getenv("PERCENTILE_INDEX_PATH", "/tmp/cs2_percentile_index.bin")
+PERCENTILE_MIN_SAMPLES = int(os.getenv("PERCENTILE_MIN_SAMPLES", "20"))
+PERCENTILE_COMPACT_THRESHOLD = int(os.getenv("PERCENTILE_COMPACT_THRESHOLD", "500"))
+PERCENTILE_REBUILD_SECONDS = float(os.getenv("PERCENTILE_REBUILD_SECONDS", "3600"))
+PERCENTILE_RELOAD_SECONDS = float(os.getenv("PERCENTILE_RELOAD_SECONDS", "30"))
+
+PERCENTILE_METRICS = ["aim", "positioning", "utility"] + DETAILED_METRICS
+
+# Analyses seen this long before an Elasticsearch rebuild started are assumed to
+# be in it; later ones may still be in the write-behind queue and are kept
+INDEX_LAG_SECONDS = 60.0
+
+MAGIC = b"CS2PCTL1"
+
+
+def analysis_values(analysis):
+    """`(bracket, values)` for an analysis; values are the per-metric diffs.
+
+    Every player in a bracket is compared to the same reference, so ranking
+    the diffs ranks the raw values too.
+    """
+    bracket = analysis.get("reference_rank")
+    if not bracket:
+        return None, None
+    values = [analysis.get(f"{metric}_diff") for metric in PERCENTILE_METRICS]
+    return bracket, [np.nan if v is None else float(v) for v in values]
+
+
+def write_snapshot(path, players, metrics=PERCENTILE_METRICS, source="compaction", built_at=None, rebuilt_at=0.0):
+    """Serialize `{steam_id: (bracket, values)}` into a file that can be memory-mapped.
+
+    Layout: magic, header length, JSON header, then 8-byte aligned arrays:
+    sorted steam IDs, each player's bracket code and metric values, and one
+    sorted run of values per (bracket, metric) described by `segments`.
+    """
+    steam_ids = sorted(players)
+    brackets = sorted({players[s][0] for s in steam_ids})
+    bracket_codes = {b: i for i, b in enumerate(brackets)}
+    id_width = max([len(s.encode()) for s in steam_ids] + [1])
+
+    ids = np.array([s.encode() for s in steam_ids], dtype=f"S{id_width}")
+    codes = np.array([bracket_codes[players[s][0]] for s in steam_ids], dtype=np.int32)
+    matrix = np.array([players[s][1] for s in steam_ids], dtype=np.float64).reshape(len(steam_ids), len(metrics))
+
+    runs, segments, start = [], [], 0
+    for code in range(len(brackets)):
+        rows = matrix[codes == code]
+        for j in range(len(metrics)):
+            column = rows[:, j]
+            column = np.sort(column[~np.isnan(column)])
+            runs.append(column)
+            segments.append([start, len(column)])
+            start += len(column)
+    values = np.concatenate(runs) if runs else np.zeros(0)
+
+    arrays = [("steam_ids", ids), ("player_brackets", codes), ("player_values", matrix), ("values", values)]
+    offsets, position = {}, 0
+    for name, array in arrays:
+        offsets[name] = position
+        position += -(-array.nbytes // 8) * 8
+    header = json.dumps({
+        "built_at": built_at if built_at is not None else time.time(),
+        "source": source,
+        "rebuilt_at": rebuilt_at,
+        "metrics": list(metrics),
+        "brackets": brackets,
+        "players": len(steam_ids),
+        "id_width": id_width,
+        "segments": segments,
+        "offsets": offsets,
+    }).encode()
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    # A unique temp file per writer, since every worker may write the same path at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for _, array in arrays:
+                data = array.tobytes()
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+        # Readers keep their mapping of the old file until they reload
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a percentile index file")
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length))
+        base = len(MAGIC) + 8 + header_length
+        offsets = header["offsets"]
+        n, m = header["players"], len(header["metrics"])
+
+        def mapped(name, dtype, shape):
+            if not int(np.prod(shape)):
+                return np.zeros(shape, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="r", offset=base + offsets[name], shape=shape)
+
+        self.path = path
+        self.built_at = header["built_at"]
+        self.source = header["source"]
+        self.rebuilt_at = header["rebuilt_at"]
+        self.metrics = header["metrics"]
+        self.brackets = header["brackets"]
+        self.steam_ids = mapped("steam_ids", f"S{header['id_width']}", (n,))
+        self.player_brackets = mapped("player_brackets", np.int32, (n,))
+        self.player_values = mapped("player_values", np.float64, (n, m))
+        values = mapped("values", np.float64, (sum(length for _, length in header["segments"]),))
+        self.runs = {}
+        for i, bracket in enumerate(self.brackets):
+            for j, metric in enumerate(self.metrics):
+                start, length = header["segments"][i * m + j]
+                self.runs[(bracket, metric)] = values[start:start + length]
+
+    def __len__(self):
+        return len(self.steam_ids)
+
+    def player(self, steam_id):
+        """`(bracket, values)` stored for a player, or None."""
+        key = steam_id.encode()
+        i = int(np.searchsorted(self.steam_ids, key))
+        if i < len(self.steam_ids) and self.steam_ids[i] == key:
+            return self.brackets[self.player_brackets[i]], list(self.player_values[i])
+        return None
+
+    def players(self):
+        return {
+            steam_id.decode(): (self.brackets[code], list(values))
+            for steam_id, code, values in zip(self.steam_ids, self.player_brackets, self.player_values)
+        }
+
+
+class PercentileIndex:
+    """Per-bracket percentile ranks for every metric of every indexed player.
+
+    The bulk of the data is a snapshot of sorted per-(bracket, metric) arrays
+    in a memory-mapped file that all workers share. Analyses that arrive after
+    the snapshot go into a small in-memory delta of sorted lists, with the
+    snapshot values they replace tracked separately, so a rank is a handful of
+    binary searches. Once the delta passes `compact_threshold` players it is
+    merged into a new snapshot; the snapshot is rebuilt from
+    `player_training_data` every `rebuild_seconds` and reloaded whenever
+    another worker has written a newer one.
+    """
+
+    def __init__(self, path=PERCENTILE_INDEX_PATH, min_samples=PERCENTILE_MIN_SAMPLES,
+                 compact_threshold=PERCENTILE_COMPACT_THRESHOLD, rebuild_seconds=PERCENTILE_REBUILD_SECONDS,
+                 reload_seconds=PERCENTILE_RELOAD_SECONDS):
+        self.path = path
+        self.min_samples = min_samples
+        self.compact_threshold = compact_threshold
+        self.rebuild_seconds = rebuild_seconds
+        self.reload_seconds = reload_seconds
+        self._snapshot = None
+        self._snapshot_mtime = None
+        # steam_id -> (sequence, observed_at, bracket, values) for analyses newer than the snapshot
+        self._delta = {}
+        self._sequence = 0
+        self._added = {}
+        self._removed = {}
+        self._replaced = 0
+        self._task = None
+        self._maintenance = None
+
+    @property
+    def players(self):
+        snapshot_players = len(self._snapshot) if self._snapshot is not None else 0
+        return snapshot_players + len(self._delta) - self._replaced
+
+    @property
+    def delta_size(self):
+        return len(self._delta)
+
+    def _insert(self, lists, bracket, values):
+        for metric, value in zip(PERCENTILE_METRICS, values):
+            if not np.isnan(value):
+                bisect.insort(lists.setdefault((bracket, metric), []), value)
+
+    def _delete(self, lists, bracket, values):
+        for metric, value in zip(PERCENTILE_METRICS, values):
+            if not np.isnan(value):
+                run = lists[(bracket, metric)]
+                del run[bisect.bisect_left(run, value)]
+
+    def _apply(self, steam_id, bracket, values):
+        previous = self._delta.get(steam_id)
+        if previous is not None:
+            self._delete(self._added, previous[2], previous[3])
+        elif self._snapshot is not None:
+            # The snapshot's copy of this player no longer counts
+            stored = self._snapshot.player(steam_id)
+            if stored is not None:
+                self._insert(self._removed, *self._stored_values(stored))
+                self._replaced += 1
+        self._insert(self._added, bracket, values)
+
+    def _stored_values(self, stored, snapshot=None):
+        # Snapshots written with a different metric list are realigned by name
+        if snapshot is None:
+            snapshot = self._snapshot
+        bracket, values = stored
+        if snapshot.metrics == PERCENTILE_METRICS:
+            return bracket, values
+        by_metric = dict(zip(snapshot.metrics, values))
+        return bracket, [by_metric.get(metric, np.nan) for metric in PERCENTILE_METRICS]
+
+    def observe(self, steam_id, analysis):
+        """Add or replace a player's latest analysis."""
+        bracket, values = analysis_values(analysis)
+        if bracket is None:
+            return
+        self._apply(steam_id, bracket, values)
+        self._sequence += 1
+        self._delta[steam_id] = (self._sequence, time.time(), bracket, values)
+        if len(self._delta) >= self.compact_threshold:
+            self._schedule(self.compact)
+
+    def _count(self, bracket, metric, value):
+        """`(values below, values equal, total)` across snapshot and delta."""
+        below = equal = total = 0
+        if self._snapshot is not None:
+            run = self._snapshot.runs.get((bracket, metric))
+            if run is not None and len(run):
+                left = int(np.searchsorted(run, value, "left"))
+                below += left
+                equal += int(np.searchsorted(run, value, "right")) - left
+                total += len(run)
+        for lists, sign in ((self._added, 1), (self._removed, -1)):
+            run = lists.get((bracket, metric))
+            if run:
+                left = bisect.bisect_left(run, value)
+                below += sign * left
+                equal += sign * (bisect.bisect_right(run, value) - left)
+                total += sign * len(run)
+        return below, equal, total
+
+    def ranks(self, analysis):
+        """Percentile of each metric among players in the same bracket (100 = best).
+
+        Metrics with fewer than `min_samples` players in the bracket are left out.
+        """
+        bracket, values = analysis_values(analysis)
+        if bracket is None:
+            return {}
+        ranks = {}
+        for metric, value in zip(PERCENTILE_METRICS, values):
+            if np.isnan(value):
+                continue
+            below, equal, total = self._count(bracket, metric, value)
+            if total < self.min_samples:
+                continue
+            percentile = (below + 0.5 * equal) / total * 100
+            if metric in LOWER_IS_BETTER_METRICS:
+                percentile = 100 - percentile
+            ranks[metric] = round(percentile, 1)
+        return ranks
+
+    def annotate(self, steam_id, analysis, observe=True):
+        """Add the player's `percentiles` to an analysis, first adding it to the index if `observe`."""
+        if observe:
+            self.observe(steam_id, analysis)
+        analysis["percentiles"] = self.ranks(analysis)
+        return analysis
+
+    def _load(self, drop_before=None, drop_through=None):
+        """Map the snapshot file and replay the delta entries it does not cover."""
+        snapshot = Snapshot(self.path)
+        self._snapshot = snapshot
+        self._snapshot_mtime = os.path.getmtime(self.path)
+        delta = self._delta
+        self._delta, self._added, self._removed = {}, {}, {}
+        self._replaced = 0
+        for steam_id, entry in sorted(delta.items(), key=lambda item: item[1][0]):
+            sequence, observed_at, bracket, values = entry
+            if drop_through is not None and sequence <= drop_through:
+                continue
+            if drop_before is not None and observed_at < drop_before:
+                continue
+            self._apply(steam_id, bracket, values)
+            self._delta[steam_id] = entry
+
+    def reload(self):
+        """Pick up a snapshot written by another worker."""
+        if not os.path.exists(self.path):
+            return False
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._snapshot_mtime:
+            return False
+        try:
+            snapshot = Snapshot(self.path)
+        except Exception as e:
+            # Empty, truncated or foreign file; keep serving the current snapshot
+            print(f"Warning: could not load percentile index {self.path}: {e}")
+            return False
+        # Another worker's compaction does not contain our delta; a rebuild from
+        # Elasticsearch contains everything indexed before it started
+        drop_before = snapshot.built_at - INDEX_LAG_SECONDS if snapshot.source == "elasticsearch" else None
+        self._load(drop_before=drop_before)
+        return True
+
+    def _write_compacted(self, snapshot, delta):
+        players = {}
+        if snapshot is not None:
+            players = {s: self._stored_values(stored, snapshot) for s, stored in snapshot.players().items()}
+        for steam_id, (_, _, bracket, values) in delta.items():
+            players[steam_id] = (bracket, values)
+        # Keeps the time of the last full rebuild so compactions do not postpone it
+        rebuilt_at = snapshot.rebuilt_at if snapshot is not None else 0.0
+        write_snapshot(self.path, players, rebuilt_at=rebuilt_at)
+
+    async def compact(self):
+        """Merge the delta into a new snapshot file."""
+        sequence = self._sequence
+        with track_stage("percentile_compact"):
+            await asyncio.to_thread(self._write_compacted, self._snapshot, dict(self._delta))
+        self._load(drop_through=sequence)
+        print(f"Percentile index compacted: {len(self._snapshot)} players")
+
+    async def rebuild(self):
+        """Rebuild the snapshot from every document in `player_training_data`."""
+        from elasticsearch.helpers import async_scan
+        started = time.time()
+        players = {}
+        fields = ["steam_id", "analysis.reference_rank"] + [f"analysis.{m}_diff" for m in PERCENTILE_METRICS]
+        with track_stage("percentile_rebuild"):
+            async for hit in async_scan(get_es(), index="player_training_data", query={"query": {"match_all": {}}},
+                                        _source=fields, size=1000):
+                source = hit["_source"]
+                bracket, values = analysis_values(source.get("analysis") or {})
+                if bracket is not None:
+                    players[str(source.get("steam_id") or hit["_id"])] = (bracket, values)
+            await asyncio.to_thread(write_snapshot, self.path, players, source="elasticsearch",
+                                    built_at=started, rebuilt_at=started)
+        self._load(drop_before=started - INDEX_LAG_SECONDS)
+        print(f"Percentile index rebuilt from Elasticsearch: {len(players)} players")
+
+    def _schedule(self, job):
+        # One maintenance job at a time; the next observe or tick retries
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = asyncio.create_task(self._guarded(job))
+
+    async def _guarded(self, job):
+        try:
+            await job()
+        except Exception as e:
+            print(f"Percentile index {job.__name__} failed: {e}")
+
+    def _tick(self):
+        self.reload()
+        # Through _schedule, so a rebuild never overlaps a compaction started by observe
+        if self._snapshot is None or time.time() - self._snapshot.rebuilt_at > self.rebuild_seconds:
+            self._schedule(self.rebuild)
+        elif len(self._delta) >= self.compact_threshold:
+            self._schedule(self.compact)
+
+    async def _run(self):
+        while True:
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"Percentile index maintenance failed: {e}")
+            await asyncio.sleep(self.reload_seconds)
+
+    def start(self):
+        """Load (or build) the snapshot in the background and keep it current."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._maintenance):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._maintenance = None
+
+
+percentile_index = PercentileIndex()
+
+Gauge("cs2_percentile_index_players", "Players in the percentile index", callback=lambda: percentile_index.players)
+Gauge("cs2_percentile_index_delta_players", "Players observed since the last percentile snapshot", callback=lambda: percentile_index.delta_size)
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from app.leetify_client import get_player_data
+from app.data_processing import analyze_player_data
+from app.elastic_client import get_es, index_player_data, get_player_document
+from app.percentile_index import percentile_index
+from app.recommendation_cache import analysis_hash, get_or_generate_recommendations
+from app.metrics import Gauge, CallbackCounter, track_stage
+
+load_dotenv()
+
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "true").lower() == "true"
+PRECOMPUTE_INTERVAL = float(os.getenv("PRECOMPUTE_INTERVAL", "300"))
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+# Precomputed results older than this are not served; the request computes live instead
+PRECOMPUTE_MAX_AGE = float(os.getenv("PRECOMPUTE_MAX_AGE", "3600"))
+TRACKED_PLAYERS = [s.strip() for s in os.getenv("TRACKED_PLAYERS", "").split(",") if s.strip()]
+TRACKED_PLAYERS_MAX = int(os.getenv("TRACKED_PLAYERS_MAX", "500"))
+TRACKED_PLAYERS_INDEX = "tracked_players"
+
+
+class TrackedPlayersFullError(Exception):
+    """The roster is already at TRACKED_PLAYERS_MAX players."""
+
+
+class PrecomputeScheduler:
+    """Keeps the analysis of tracked players ready before anyone asks for it.
+
+    Tracked Steam IDs are stored in the `tracked_players` index, which is
+    re-read before each run so all workers see the same roster; IDs in
+    TRACKED_PLAYERS are always tracked. Every `interval` seconds each player
+    is run through the analysis pipeline, `concurrency` at a time. Leetify
+    data comes through the response cache, so upstream is only asked once an
+    entry is stale, and then conditionally. Recommendations are generated and
+    indexed only when the analysis hash differs from the last run, i.e. when
+    the data changed.
+    """
+
+    def __init__(self, enabled=PRECOMPUTE_ENABLED, interval=PRECOMPUTE_INTERVAL,
+                 concurrency=PRECOMPUTE_CONCURRENCY, max_age=PRECOMPUTE_MAX_AGE,
+                 seed=TRACKED_PLAYERS, max_players=TRACKED_PLAYERS_MAX):
+        self.enabled = enabled
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.max_players = max_players
+        self.seed = set(seed)
+        self.tracked = set(seed)
+        # steam_id -> {"analysis", "recommendations", "analysis_hash", "generated_at"}
+        self._results = {}
+        self._task = None
+        self._pending = set()
+        self.runs = 0
+        self.computed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.last_run_seconds = None
+
+    async def _load(self):
+        response = await get_es().search(index=TRACKED_PLAYERS_INDEX, body={"query": {"match_all": {}}},
+                                         size=self.max_players, ignore_unavailable=True)
+        self.tracked = self.seed | {hit['_id'] for hit in response['hits']['hits']}
+        for steam_id in list(self._results):
+            if steam_id not in self.tracked:
+                del self._results[steam_id]
+
+    async def track(self, steam_id):
+        """Add a player and precompute them right away."""
+        if steam_id not in self.tracked and len(self.tracked) >= self.max_players:
+            raise TrackedPlayersFullError(f"At most {self.max_players} tracked players; untrack one first")
+        await get_es().index(index=TRACKED_PLAYERS_INDEX, id=steam_id,
+                             document={"steam_id": steam_id, "tracked_at": time.time()})
+        self.tracked.add(steam_id)
+        if self.enabled:
+            task = asyncio.create_task(self.precompute(steam_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def untrack(self, steam_id):
+        self.tracked.discard(steam_id)
+        self._results.pop(steam_id, None)
+        try:
+            await get_es().delete(index=TRACKED_PLAYERS_INDEX, id=steam_id)
+        except Exception as e:
+            if getattr(e, "status_code", None) != 404:
+                raise
+
+    async def precompute(self, steam_id):
+        """Run the pipeline for one player. Returns True if a new result was indexed."""
+        try:
+            with track_stage("precompute"):
+                profile, matches = await get_player_data(steam_id)
+                analysis = await analyze_player_data(profile, matches, steam_id)
+                cache_key = analysis_hash(analysis)
+                previous = self._results.get(steam_id)
+                if previous is not None and previous["analysis_hash"] == cache_key:
+                    previous["generated_at"] = time.time()
+                    self.unchanged += 1
+                    return False
+                percentile_index.annotate(steam_id, analysis)
+                recommendations = await get_or_generate_recommendations(analysis, cache_key)
+                await index_player_data(steam_id, analysis, recommendations, analysis_hash=cache_key)
+            if steam_id in self.tracked:
+                self._results[steam_id] = {
+                    "analysis": analysis,
+                    "recommendations": recommendations,
+                    "analysis_hash": cache_key,
+                    "generated_at": time.time(),
+                }
+            self.computed += 1
+            return True
+        except Exception as e:
+            self.failed += 1
+            print(f"Precompute failed for {steam_id}: {e}")
+            return False
+
+    async def run_once(self):
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(steam_id):
+            async with semaphore:
+                await self.precompute(steam_id)
+
+        await asyncio.gather(*(bounded(steam_id) for steam_id in sorted(self.tracked)))
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+
+    async def get(self, steam_id):
+        """The precomputed `{"analysis", "recommendations"}` for a tracked player, or None.
+
+        Served from memory, or from `player_training_data` when another worker
+        (or an earlier process) computed it. Results older than `max_age` are
+        ignored.
+        """
+        if steam_id not in self.tracked:
+            return None
+        result = self._results.get(steam_id)
+        if result is None:
+            doc = await get_player_document(steam_id)
+            if doc is None or not doc.get("analysis_hash"):
+                return None
+            result = {key: doc.get(key) for key in ("analysis", "recommendations", "analysis_hash", "generated_at")}
+            result["generated_at"] = result["generated_at"] or 0.0
+            self._results[steam_id] = result
+        if time.time() - result["generated_at"] > self.max_age:
+            return None
+        return {"analysis": result["analysis"], "recommendations": result["recommendations"]}
+
+    async def _run(self):
+        while True:
+            try:
+                await self._load()
+            except Exception as e:
+                print(f"Could not load tracked players, keeping the current list: {e}")
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in [self._task] + list(self._pending):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "tracked": len(self.tracked),
+            "ready": sum(1 for s in self.tracked if s in self._results),
+            "runs": self.runs,
+            "computed": self.computed,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+precompute_scheduler = PrecomputeScheduler()
+
+Gauge("cs2_tracked_players", "Players kept precomputed by the background scheduler", callback=lambda: len(precompute_scheduler.tracked))
+CallbackCounter("cs2_precompute_computed_total", "Precompute runs that indexed a new result", callback=lambda: precompute_scheduler.computed)
+CallbackCounter("cs2_precompute_unchanged_total", "Precompute runs skipped because the data had not changed", callback=lambda: precompute_scheduler.unchanged)
+CallbackCounter("cs2_precompute_failed_total", "Precompute runs that failed", callback=lambda: precompute_scheduler.failed)
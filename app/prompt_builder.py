@@ -0,0 +1,133 @@
+from app.data_processing import DETAILED_METRICS, LOWER_IS_BETTER_METRICS
+
+# Static instructions, sent once as the system instruction instead of being
+# repeated inside every prompt
+PREAMBLE = """You are a Counter-Strike 2 coach. You get a player's metrics compared to the average of players at their rank.
+
+Table columns: skill | diff (player minus rank average, in the metric's own units) | avg (rank average) | score | recent.
+- score is the diff normalised to the metric's typical spread and oriented so that negative always means worse than average, including metrics where lower raw values are better (Time to Damage, Crosshair Placement, Utility on Death, teammate flashes and HE damage). Rows are sorted worst first.
+- Aim, Positioning and Utility are core skills and already weighted higher in score.
+- Clutch, Opening Duels, CT Side Rating and T Side Rating are zero-sum ratings: 0 is average.
+- recent is the change of the player's last matches against their longer history, in the metric's units; it is blank when no match history is available.
+- Skills not listed are close to the rank average.
+
+Talk to the player directly and wrap skill names in brackets like [Aim] or [Headshot Accuracy]."""
+
+PLAYER_TASK = """Provide:
+1. An overall performance score out of 100 compared to their rank average, weighing core skills most.
+2. 3-4 specific, actionable training recommendations for the biggest weaknesses first, with workshop maps, aim trainers or practice routines where relevant.
+
+Format your response as:
+**Overall Score: X/100**
+
+[Your recommendations here]"""
+
+TEAM_TASK = """Each block below is one player (keyed by Steam ID). Provide:
+1. The team's shared strengths and weaknesses
+2. 3-4 team practice routines that address the biggest shared weaknesses
+3. One short, specific focus point per player"""
+
+CORE_METRICS = ["aim", "positioning", "utility"]
+RAW_METRICS = ["clutch", "opening", "ct_leetify", "t_leetify"]
+CORE_WEIGHT = 1.5
+
+# Roughly one "noticeable" difference per metric, used to put diffs on one scale
+METRIC_SCALES = {
+    "aim": 5.0,
+    "positioning": 5.0,
+    "utility": 5.0,
+    "accuracy_enemy_spotted": 3.0,
+    "accuracy_head": 3.0,
+    "counter_strafing_good_shots_ratio": 5.0,
+    "flashbang_hit_foe_avg_duration": 0.3,
+    "flashbang_hit_foe_per_flashbang": 0.1,
+    "flashbang_hit_friend_per_flashbang": 0.1,
+    "flashbang_leading_to_kill": 1.0,
+    "he_foes_damage_avg": 2.0,
+    "he_friends_damage_avg": 0.5,
+    "preaim": 2.0,
+    "reaction_time_ms": 50.0,
+    "spray_accuracy": 3.0,
+    "utility_on_death_avg": 50.0,
+    "clutch": 1.0,
+    "opening": 1.0,
+    "ct_leetify": 1.0,
+    "t_leetify": 1.0,
+}
+
+# Readable names for metrics the analysis' metric_names mapping does not cover
+EXTRA_METRIC_NAMES = {
+    "flashbang_hit_foe_avg_duration": "Flash Blind Duration",
+    "flashbang_hit_friend_per_flashbang": "Teammates Flashed",
+    "flashbang_leading_to_kill": "Flashes Leading to Kills",
+    "he_friends_damage_avg": "HE Team Damage",
+}
+
+# Rows whose |score| is below this are left out as "close to average"
+MIN_SCORE = 0.25
+
+
+def _number(value):
+    """Short, deterministic number formatting."""
+    if value is None:
+        return ""
+    value = round(float(value), 2)
+    return f"{value:g}"
+
+
+def metric_rows(analysis):
+    """Score every metric in the analysis, worst first.
+
+    Returns `(key, name, diff, avg, score, recent)` tuples where `score` is the
+    diff divided by the metric's scale, negated for lower-is-better metrics and
+    weighted for core skills, so negative always means below the rank average.
+    """
+    names = dict(EXTRA_METRIC_NAMES)
+    names.update(analysis.get("metric_names") or {})
+    references = analysis.get("reference_values") or {}
+    trends = (analysis.get("match_trends") or {}).get("metrics", {})
+
+    rows = []
+    for metric in CORE_METRICS + DETAILED_METRICS + RAW_METRICS:
+        if metric in RAW_METRICS:
+            diff, avg = analysis.get(metric), 0
+        else:
+            diff, avg = analysis.get(f"{metric}_diff"), references.get(metric)
+        if diff is None:
+            continue
+        score = diff / METRIC_SCALES.get(metric, 1.0)
+        if metric in LOWER_IS_BETTER_METRICS:
+            score = -score
+        if metric in CORE_METRICS:
+            score *= CORE_WEIGHT
+        recent = trends.get(metric, {}).get("delta")
+        rows.append((metric, names.get(metric, metric), diff, avg, round(score, 2), recent))
+
+    rows.sort(key=lambda row: (row[4], row[0]))
+    return rows
+
+
+def metric_table(analysis, limit=None):
+    """Compact pipe-separated table of the metrics that differ from average."""
+    rows = [row for row in metric_rows(analysis) if abs(row[4]) >= MIN_SCORE]
+    if limit is not None and len(rows) > limit:
+        # Keep the worst rows plus the single best strength
+        rows = rows[:limit - 1] + rows[-1:]
+    lines = ["skill|diff|avg|score|recent"]
+    for _, name, diff, avg, score, recent in rows:
+        lines.append(f"{name}|{_number(diff)}|{_number(avg)}|{_number(score)}|{_number(recent)}")
+    return "\n".join(lines)
+
+
+def build_player_prompt(analysis):
+    rank = analysis.get("reference_rank") or "unknown"
+    return f"Rank: {rank}\n{metric_table(analysis)}\n\n{PLAYER_TASK}"
+
+
+def build_team_prompt(analyses, per_player=6):
+    blocks = []
+    for steam_id in sorted(analyses):
+        analysis = analyses[steam_id]
+        rank = analysis.get("reference_rank") or "unknown"
+        blocks.append(f"Player {steam_id} ({rank})\n{metric_table(analysis, limit=per_player)}")
+    return "\n\n".join(blocks) + f"\n\n{TEAM_TASK}"
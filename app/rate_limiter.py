@@ -0,0 +1,185 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot get a slot before its deadline."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    `reserve` takes a token now and returns how long the caller must wait for
+    it, so async and threaded callers can sleep in their own way. A lock keeps
+    the sync helpers on the threadpool consistent with the event loop.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def refund(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds`, e.g. after a Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimiter:
+    """Token-bucket rate limit plus an AIMD concurrency cap.
+
+    Callers queue for a slot until their deadline instead of failing outright.
+    The concurrency limit grows by roughly one per window of successful calls
+    and halves whenever upstream throttles us. Coroutines use `acquire` and
+    `release`, threads `acquire_blocking` and `release_blocking`; both share
+    the same slots, so the cap holds across the event loop and the threadpool.
+    """
+
+    def __init__(self, rate, burst, max_concurrency, min_concurrency=1, on_wait=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.on_wait = on_wait
+        # Guards in_flight and limit; threads wait on it directly
+        self._slots = threading.Condition()
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self):
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+            self._loop = asyncio.get_running_loop()
+        return self._condition
+
+    def _reserve(self, started, deadline):
+        wait = self.bucket.reserve()
+        if started + wait > deadline:
+            self.bucket.refund()
+            raise RateLimitExceeded("Rate limit queue deadline exceeded", retry_after=wait)
+        return wait
+
+    def _try_take_slot(self):
+        with self._slots:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def _concurrency_timeout(self):
+        # No request goes out, so the token is not spent
+        self.bucket.refund()
+        return RateLimitExceeded("Concurrency queue deadline exceeded", retry_after=1.0)
+
+    async def acquire(self, deadline):
+        started = time.monotonic()
+        wait = self._reserve(started, deadline)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        condition = self._get_condition()
+        async with condition:
+            while not self._try_take_slot():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._concurrency_timeout()
+                try:
+                    await asyncio.wait_for(condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        if self.on_wait is not None:
+            self.on_wait(time.monotonic() - started)
+
+    def acquire_blocking(self, deadline):
+        """`acquire` for synchronous callers, sleeping the calling thread."""
+        started = time.monotonic()
+        wait = self._reserve(started, deadline)
+        if wait > 0:
+            time.sleep(wait)
+
+        with self._slots:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._concurrency_timeout()
+                self._slots.wait(remaining)
+            self.in_flight += 1
+        if self.on_wait is not None:
+            self.on_wait(time.monotonic() - started)
+
+    def _release_slot(self, throttled, failed):
+        """Free a slot. Throttling halves the limit; only a call that got a response grows it."""
+        with self._slots:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            elif not failed:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._slots.notify_all()
+
+    async def _notify(self):
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+    async def release(self, throttled=False, failed=False):
+        self._release_slot(throttled, failed)
+        await self._notify()
+
+    def release_blocking(self, throttled=False, failed=False):
+        self._release_slot(throttled, failed)
+        # Wake coroutines queued on the event loop as well
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self._notify()))
+            except RuntimeError:
+                pass
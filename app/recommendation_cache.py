@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.elastic_client import get_es
+from app.metrics import Gauge, CallbackCounter
+from app.vertex_client import PROMPT_VERSION, generate_recommendations, stream_recommendations
+
+load_dotenv()
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_PERSISTENT = os.getenv("RECOMMENDATION_CACHE_PERSISTENT", "true").lower() == "true"
+
+# Fields that change without the player changing and never reach the prompt
+UNHASHED_FIELDS = ("percentiles",)
+
+def analysis_hash(analysis: dict, prompt_version: str = PROMPT_VERSION):
+    """Stable content hash of an analysis and the prompt template it is rendered with."""
+    analysis = {k: v for k, v in analysis.items() if k not in UNHASHED_FIELDS}
+    payload = json.dumps(
+        {"prompt_version": prompt_version, "analysis": analysis},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """Two-tier cache of Gemini recommendations keyed on `analysis_hash`.
+
+    The in-memory tier is an LRU of `max_size` entries (0 disables it). The
+    persistent tier looks up earlier analyses in the `player_training_data`
+    index, where `index_player_data` stores the hash next to the recommendations.
+    """
+
+    def __init__(self, max_size=RECOMMENDATION_CACHE_SIZE, persistent=RECOMMENDATION_CACHE_PERSISTENT):
+        self.max_size = max_size
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def put(self, key: str, recommendations: str):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = recommendations
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _lookup_persistent(self, key: str):
+        try:
+            response = await get_es().search(index="player_training_data", body={
+                "query": {"match": {"analysis_hash": key}},
+                "size": 1,
+                "_source": ["analysis_hash", "recommendations"],
+            })
+        except Exception as e:
+            print(f"Warning: recommendation cache lookup failed: {e}")
+            return None
+        for hit in response['hits']['hits']:
+            data = hit['_source']
+            if data.get('analysis_hash') == key and data.get('recommendations'):
+                return data['recommendations']
+        return None
+
+    async def get(self, key: str):
+        """Return cached recommendations for `key`, or None on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if self.persistent:
+            recommendations = await self._lookup_persistent(key)
+            if recommendations is not None:
+                self.persistent_hits += 1
+                self.put(key, recommendations)
+                return recommendations
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+        }
+
+
+recommendation_cache = RecommendationCache()
+
+Gauge("cs2_recommendation_cache_size", "Entries in the in-memory recommendation cache", callback=lambda: len(recommendation_cache._entries))
+CallbackCounter("cs2_recommendation_cache_hits_total", "In-memory recommendation cache hits", callback=lambda: recommendation_cache.hits)
+CallbackCounter("cs2_recommendation_cache_persistent_hits_total", "Recommendation cache hits served from Elasticsearch", callback=lambda: recommendation_cache.persistent_hits)
+CallbackCounter("cs2_recommendation_cache_misses_total", "Recommendation cache misses", callback=lambda: recommendation_cache.misses)
+
+async def get_or_generate_recommendations(analysis: dict, key: str = None):
+    """Return cached recommendations for this analysis, calling Gemini only on a miss."""
+    key = key or analysis_hash(analysis)
+    recommendations = await recommendation_cache.get(key)
+    if recommendations is None:
+        recommendations = await generate_recommendations(analysis)
+        recommendation_cache.put(key, recommendations)
+    return recommendations
+
+async def stream_or_replay_recommendations(analysis: dict, key: str = None):
+    """Like `stream_recommendations`, but a cache hit is replayed as a single chunk."""
+    key = key or analysis_hash(analysis)
+    recommendations = await recommendation_cache.get(key)
+    if recommendations is not None:
+        yield recommendations
+        return
+    chunks = []
+    async for chunk in stream_recommendations(analysis):
+        chunks.append(chunk)
+        yield chunk
+    recommendation_cache.put(key, "".join(chunks))
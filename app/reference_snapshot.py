@@ -0,0 +1,83 @@
+"""Local snapshot of the reference tables, so analysis does not need Elasticsearch.
+
+The file is JSON lines: a header line with the format name and version, then
+one line per Leetify tier and per Premier/Faceit bracket. Export it from
+Elasticsearch with:
+
+    python -m app.reference_snapshot [path]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+SNAPSHOT_FORMAT = "cs2-reference-tables"
+SNAPSHOT_VERSION = 1
+
+
+def write_reference_snapshot(path, tables, source="elasticsearch"):
+    """Write `(premier_reference, faceit_reference, leetify_tiers)` atomically to `path`."""
+    premier_reference, faceit_reference, leetify_tiers = tables
+    lines = [{"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION,
+              "exported_at": time.time(), "source": source}]
+    for tier, (low, high) in sorted(leetify_tiers.items(), key=lambda item: item[1]):
+        lines.append({"table": "leetify", "tier": tier, "low": low, "high": high})
+    for table, reference in (("premier", premier_reference), ("faceit", faceit_reference)):
+        for (low, high), values in sorted(reference.items()):
+            lines.append({"table": table, "low": low, "high": high, "values": values})
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Workers refresh at the same moment, so each writes its own temp file
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            for line in lines:
+                f.write(json.dumps(line, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_reference_snapshot(path):
+    """Read a snapshot file. Returns `(tables, header)`; raises on a missing or unknown file."""
+    premier_reference, faceit_reference, leetify_tiers = {}, {}, {}
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            raise Exception(f"Unsupported reference snapshot {path}: {header.get('format')} v{header.get('version')}")
+        for line in f:
+            row = json.loads(line)
+            if row["table"] == "leetify":
+                leetify_tiers[row["tier"]] = (row["low"], row["high"])
+            elif row["table"] == "premier":
+                premier_reference[(row["low"], row["high"])] = row["values"]
+            elif row["table"] == "faceit":
+                faceit_reference[(row["low"], row["high"])] = row["values"]
+    if not (premier_reference and faceit_reference and leetify_tiers):
+        raise Exception(f"Reference snapshot {path} is missing a table")
+    return (premier_reference, faceit_reference, leetify_tiers), header
+
+
+async def export_from_elasticsearch(path):
+    from app.elastic_client import close_es
+    from app.elastic_reference_loader import load_reference_tables
+
+    try:
+        tables = await load_reference_tables()
+    finally:
+        await close_es()
+    write_reference_snapshot(path, tables)
+    premier_reference, faceit_reference, leetify_tiers = tables
+    print(f"Wrote {path}: {len(premier_reference)} premier, {len(faceit_reference)} faceit "
+          f"brackets, {len(leetify_tiers)} tiers")
+
+
+if __name__ == "__main__":
+    from app.reference_store import REFERENCE_SNAPSHOT_PATH
+
+    asyncio.run(export_from_elasticsearch(sys.argv[1] if len(sys.argv) > 1 else REFERENCE_SNAPSHOT_PATH))
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from app.elastic_reference_loader import load_reference_tables
+from app.reference_snapshot import read_reference_snapshot, write_reference_snapshot
+from app.interval_index import IntervalIndex
+from app.metrics import track_stage
+
+load_dotenv()
+
+REFERENCE_TTL_SECONDS = float(os.getenv("REFERENCE_TTL_SECONDS", "3600"))
+# After a failed refresh, requests wait this long before triggering another
+REFERENCE_RETRY_SECONDS = float(os.getenv("REFERENCE_RETRY_SECONDS", "60"))
+# Outside the package so runtime rewrites never land in the source tree; the
+# deploy workflow exports a snapshot here before building the image
+REFERENCE_SNAPSHOT_PATH = os.getenv(
+    "REFERENCE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "reference_tables.jsonl"),
+)
+# With sync off the snapshot is the only source and Elasticsearch is never contacted
+REFERENCE_ES_SYNC = os.getenv("REFERENCE_ES_SYNC", "true").lower() == "true"
+
+# Bracket used when a player has neither a Faceit nor a Premier rank
+DEFAULT_PREMIER_BRACKET = (10000, 14999)
+
+
+class ReferenceTables:
+    """Reference tables plus the interval indexes built over them."""
+
+    def __init__(self, premier_reference, faceit_reference, leetify_tiers):
+        self.premier_reference = premier_reference
+        self.faceit_reference = faceit_reference
+        self.leetify_tiers = leetify_tiers
+
+        # Ranks and Elo are integers, tier values are rounded to 2 decimals
+        self.premier_index = IntervalIndex(
+            premier_reference.items(), fallback=DEFAULT_PREMIER_BRACKET, step=1
+        )
+        self.faceit_index = IntervalIndex(faceit_reference.items(), step=1)
+        self.tier_index = IntervalIndex(
+            ((bounds, tier) for tier, bounds in leetify_tiers.items()), step=0.01
+        )
+
+        for name, index in (("premier", self.premier_index),
+                            ("faceit", self.faceit_index),
+                            ("leetify tier", self.tier_index)):
+            if index.gaps:
+                print(f"Warning: gaps in {name} reference brackets: {index.gaps}")
+            if index.overlaps:
+                print(f"Warning: overlapping {name} reference brackets: {index.overlaps}")
+        if self.premier_index.fallback is None:
+            print(f"Warning: default premier bracket {DEFAULT_PREMIER_BRACKET} not found")
+
+
+class ReferenceStore:
+    """Process-wide cache of the reference tables.
+
+    Tables come from the local snapshot file when there is one, so startup
+    and analysis do not depend on Elasticsearch. With `es_sync` on,
+    Elasticsearch is the sync source: tables are refreshed from it in the
+    background every `ttl` seconds and each successful refresh rewrites the
+    snapshot. Readers always get the last good copy, even while a refresh is
+    running or when Elasticsearch is down; after a failed refresh, requests
+    do not trigger another one for `retry_seconds`.
+    """
+
+    def __init__(self, ttl=REFERENCE_TTL_SECONDS, snapshot_path=REFERENCE_SNAPSHOT_PATH, es_sync=REFERENCE_ES_SYNC,
+                 retry_seconds=REFERENCE_RETRY_SECONDS):
+        self.ttl = ttl
+        self.retry_seconds = retry_seconds
+        self.snapshot_path = snapshot_path
+        self.es_sync = es_sync
+        self.source = None
+        self._tables = None
+        self._loaded_at = 0.0
+        self._refresh_failed_at = None
+        # asyncio primitives are created lazily so they bind to the running loop
+        self._lock = None
+        self._refresh_task = None
+        self._background_task = None
+
+    @property
+    def loaded(self):
+        return self._tables is not None
+
+    @property
+    def loaded_at(self):
+        """Monotonic time the current tables were loaded; changes on every reload."""
+        return self._loaded_at if self.loaded else None
+
+    @property
+    def age(self):
+        return time.monotonic() - self._loaded_at if self.loaded else None
+
+    def _get_lock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _set(self, tables, source):
+        self._tables = ReferenceTables(*tables)
+        self._loaded_at = time.monotonic()
+        self.source = source
+
+    async def _load_snapshot(self):
+        """Load the local snapshot. Returns False if there is none or it is unreadable."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            tables, header = await asyncio.to_thread(read_reference_snapshot, self.snapshot_path)
+        except Exception as e:
+            print(f"Warning: could not load reference snapshot {self.snapshot_path}: {e}")
+            return False
+        self._set(tables, "snapshot")
+        print(f"Loaded reference tables from snapshot exported at {time.ctime(header['exported_at'])}")
+        return True
+
+    async def _load_elasticsearch(self):
+        with track_stage("reference_load"):
+            tables = await load_reference_tables()
+        self._set(tables, "elasticsearch")
+        if self.snapshot_path:
+            try:
+                await asyncio.to_thread(write_reference_snapshot, self.snapshot_path, tables)
+            except OSError as e:
+                print(f"Warning: could not write reference snapshot {self.snapshot_path}: {e}")
+
+    async def refresh(self):
+        """Reload the tables from Elasticsearch. Keeps the old copy on failure."""
+        if not self.es_sync:
+            return False
+        async with self._get_lock():
+            try:
+                await self._load_elasticsearch()
+            except Exception as e:
+                self._refresh_failed_at = time.monotonic()
+                print(f"Reference table refresh failed, keeping previous tables: {e}")
+                return False
+            self._refresh_failed_at = None
+            return True
+
+    def _schedule_refresh(self):
+        if not self.es_sync:
+            return
+        if self._refresh_failed_at is not None and time.monotonic() - self._refresh_failed_at < self.retry_seconds:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def get(self):
+        """Return the current `ReferenceTables`."""
+        if self._tables is None:
+            # Cold store: the first caller loads, concurrent callers wait on the lock
+            async with self._get_lock():
+                if self._tables is None and not await self._load_snapshot():
+                    if not self.es_sync:
+                        raise Exception(f"Reference tables are unavailable: no snapshot at {self.snapshot_path}")
+                    try:
+                        await self._load_elasticsearch()
+                    except Exception as e:
+                        raise Exception(f"Reference tables are unavailable: {e}")
+                    return self._tables
+            if self.source == "snapshot":
+                # Bring the snapshot up to date without making this request wait
+                self._schedule_refresh()
+        elif self.age > self.ttl:
+            # Serve stale data while a refresh runs in the background
+            self._schedule_refresh()
+        return self._tables
+
+    def invalidate(self):
+        """Mark the cached tables as stale and trigger a background refresh.
+
+        A recent failed refresh still holds back the retry for `retry_seconds`.
+        """
+        self._loaded_at = 0.0
+        self._schedule_refresh()
+
+    async def _refresh_loop(self):
+        while self.es_sync:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing reference tables: {e}")
+
+    async def start(self, preload=True):
+        """Start the periodic background refresh, loading the tables first if `preload`.
+
+        A preload uses the snapshot when there is one and refreshes from
+        Elasticsearch in the background. Without a preload the first `get`
+        loads them.
+        """
+        if preload:
+            await self.get()
+        if self._background_task is None:
+            self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._background_task = None
+        self._refresh_task = None
+
+
+reference_store = ReferenceStore()
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SINGLE_FLIGHT_GRACE_SECONDS = float(os.getenv("SINGLE_FLIGHT_GRACE_SECONDS", "5"))
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight task.
+
+    Callers that arrive while a computation is running await the same task.
+    Successful results are kept for `grace_period` seconds after completion so
+    callers arriving just after it finishes get the result too. Failures are
+    never kept, the next caller starts a fresh attempt.
+    """
+
+    def __init__(self, grace_period=SINGLE_FLIGHT_GRACE_SECONDS):
+        self.grace_period = grace_period
+        self._inflight = {}
+        self._recent = {}
+
+    async def do(self, key, fn):
+        """Return the result of `fn()`, sharing it with concurrent callers for `key`."""
+        recent = self._recent.get(key)
+        if recent is not None:
+            expires_at, result = recent
+            if expires_at > time.monotonic():
+                return result
+            del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so one caller disconnecting does not cancel everyone else's result
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        now = time.monotonic()
+        for stale in [k for k, (expires_at, _) in self._recent.items() if expires_at <= now]:
+            del self._recent[stale]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.grace_period > 0:
+            self._recent[key] = (now + self.grace_period, task.result())
+
+    def forget(self, key):
+        """Drop any completed result for `key` so the next call recomputes."""
+        self._recent.pop(key, None)
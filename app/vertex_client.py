@@ -1,83 +1,143 @@
-from google import genai
-from google.genai import types
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
+from app.metrics import track_stage
+from app.prompt_builder import PREAMBLE, build_player_prompt, build_team_prompt
 
 load_dotenv()
 
-os.environ["GOOGLE_CLOUD_PROJECT"] = os.getenv("GCP_PROJECT_ID")
-os.environ["GOOGLE_CLOUD_LOCATION"] = os.getenv("GCP_LOCATION")
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "True"
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/app/service_account.json"
+GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
+GCP_LOCATION = os.getenv("GCP_LOCATION")
+GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "/app/service_account.json")
 
-client = genai.Client()
+MODEL = "gemini-2.0-flash"
+
+client = None
+_credentials = None
+_generate_config = None
+
+def _load_credentials():
+    """Service account credentials if the key file exists, else None for the default credentials."""
+    if not os.path.exists(GOOGLE_APPLICATION_CREDENTIALS):
+        return None
+    from google.oauth2 import service_account
+    return service_account.Credentials.from_service_account_file(
+        GOOGLE_APPLICATION_CREDENTIALS, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+
+def get_client():
+    """Return the shared Vertex AI Gemini client, creating it on first use."""
+    global client, _credentials
+    if client is None:
+        # google-genai is slow to import, so it is loaded with the first client
+        from google import genai
+        _credentials = _load_credentials()
+        client = genai.Client(vertexai=True, project=GCP_PROJECT_ID, location=GCP_LOCATION,
+                              credentials=_credentials)
+    return client
+
+def get_generate_config():
+    """Generation config carrying the static preamble as the system instruction."""
+    global _generate_config
+    if _generate_config is None:
+        from google.genai import types
+        _generate_config = types.GenerateContentConfig(system_instruction=PREAMBLE)
+    return _generate_config
+
+async def warm_up():
+    """Create the client and fetch an access token so the first request skips both."""
+    get_client()
+    get_generate_config()
+    if _credentials is not None:
+        from google.auth.transport.requests import Request
+        await asyncio.to_thread(_credentials.refresh, Request())
+
+# Bump whenever the prompt builder changes so cached recommendations are not reused
+PROMPT_VERSION = "2"
+
+def build_prompt(analysis: dict):
+    return build_player_prompt(analysis)
 
 async def generate_recommendations(analysis: dict):
     try:
-        # Get metric names for readable output
-        metric_names = analysis.get('metric_names', {})
-        
-        prompt = f"""
-        You are a Counter-Strike 2 coach analyzing player performance data. Here's what each metric means:
-
-        IMPORTANT: Ignore the "leetify_tiers" field in the data - this is for frontend display only and should not be included in your analysis.
-
-        METRIC NAME CONVERSIONS (use these readable names in your response instead of the keys):
-        {metric_names}
-
-        PERFORMANCE METRICS (all *_diff values show difference from rank average - negative = below average):
-        - aim_diff: Difference from rank average aim rating
-        - positioning_diff: Difference from rank average positioning rating  
-        - utility_diff: Difference from rank average utility usage
-        - accuracy_enemy_spotted_diff: Difference in accuracy when enemy spotted on radar (%)
-        - accuracy_head_diff: Difference in headshot accuracy (%)
-        - counter_strafing_good_shots_ratio_diff: Difference in % of shots with proper counter-strafing
-        - flashbang_hit_foe_avg_duration_diff: Difference in average blind duration on enemies (seconds)
-        - flashbang_hit_foe_per_flashbang_diff: Difference in enemies blinded per flashbang
-        - flashbang_hit_friend_per_flashbang_diff: Difference in teammates accidentally blinded (lower is better)
-        - flashbang_leading_to_kill_diff: Difference in % of flashbangs leading to kills
-        - he_foes_damage_avg_diff: Difference in average HE grenade damage to enemies
-        - he_friends_damage_avg_diff: Difference in HE damage to teammates (lower is better)
-        - preaim_diff: Difference in degrees of time crosshair pre-positioned at angles
-        - reaction_time_ms_diff: Difference in reaction time (negative = faster, positive = slower)
-        - spray_accuracy_diff: Difference in spray control accuracy (%)
-        - utility_on_death_avg_diff: Difference in utility value held when dying (negative = better)
-        - clutch: Raw clutch situation performance rating (zero-sum: 0=average, positive=above average, negative=below average)
-        - clutch_tier: Performance tier (poor/subpar/average/good/great)
-        - opening: Raw opening duel performance rating (zero-sum: 0=average, positive=above average, negative=below average)
-        - opening_tier: Performance tier (poor/subpar/average/good/great)
-        - ct_leetify: Raw Counter-Terrorist side performance rating (zero-sum: 0=average, positive=above average, negative=below average)
-        - ct_leetify_tier: Performance tier (poor/subpar/average/good/great)
-        - t_leetify: Raw Terrorist side performance rating (zero-sum: 0=average, positive=above average, negative=below average)
-        - t_leetify_tier: Performance tier (poor/subpar/average/good/great)
-
-        Please note the following when reading through the metrics:
-        - reaction_time_ms and utility_on_death_avg are large numbers, so the magnitude of their diff metrics should have less weight
-        - flashbang_hit_foe_avg_duration, flashbang_hit_foe_per_flashbang, flashbang_hit_friend_per_flashbang, flashbang_leading_to_kill, he_foes_damage_avg, he_friends_damage_avg, and preaim are small numbers, so the magnitude of their diff metrics should have more weight
-        - flashbang_hit_friend_per_flashbang, he_friends_damage_avg, preaim, reactin_time_ms, and utility_on_death_avg are all metrics that indicate above average performance if the diff is negative, since the numbers for these metrics decrease as skill increases
-
-        IMPORTANT: When mentioning metrics in your response, use the readable names from the conversion table above, not the technical keys. Wrap metric names in brackets like [Aim] or [Headshot Accuracy] to make them stand out.
-
-        PLAYER DATA:
-        {analysis}
-
-        Based on this data, provide:
-        1. An overall performance score out of 100 compared to their rank average (consider all metrics, with more weight on core skills like aim, positioning, utility)
-        2. 3-4 specific, actionable training recommendations. Focus on the biggest weaknesses first. Include specific workshop maps, aim trainers, or practice routines where relevant.
-        
-        Format your response as:
-        **Overall Score: X/100**
-        
-        [Your recommendations here]
-        
-        You should also refer to the player directly, as if you're talking to the player.
-        """
-
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
+        # The aio client keeps the event loop free while Gemini generates
+        with track_stage("gemini_generate"):
+            response = await get_client().aio.models.generate_content(
+                model=MODEL,
+                contents=build_prompt(analysis),
+                config=get_generate_config(),
+            )
+
+        return response.text
+    except Exception as e:
+        raise Exception(f"AI recommendation generation failed: {e}")
+
+_STREAM_END = object()
+
+def _stream_in_thread(loop, queue, cancelled, prompt):
+    """Read the sync Gemini stream, handing each chunk to `queue` on the event loop."""
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is already closed
+            pass
+
+    try:
+        for chunk in get_client().models.generate_content_stream(
+            model=MODEL,
             contents=prompt,
-        )
+            config=get_generate_config(),
+        ):
+            if cancelled.is_set():
+                break
+            if chunk.text:
+                put(chunk.text)
+    except Exception as e:
+        put(e)
+    finally:
+        put(_STREAM_END)
+
+async def stream_recommendations(analysis: dict):
+    """Yield recommendation text chunks as Gemini generates them.
+
+    google-genai 0.3.0 reads the response stream synchronously even on the aio
+    client, so the stream is consumed in a worker thread and its chunks are
+    passed back through a queue.
+    """
+    cancelled = threading.Event()
+    try:
+        with track_stage("gemini_stream"):
+            prompt = build_prompt(analysis)
+            get_client()
+            get_generate_config()
+            queue = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            producer = loop.run_in_executor(None, _stream_in_thread, loop, queue, cancelled, prompt)
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await producer
+    except Exception as e:
+        raise Exception(f"AI recommendation generation failed: {e}")
+    finally:
+        # Stops the worker at its next chunk when the client goes away
+        cancelled.set()
+
+async def generate_team_recommendations(analyses: dict):
+    try:
+        with track_stage("gemini_team_generate"):
+            response = await get_client().aio.models.generate_content(
+                model=MODEL,
+                contents=build_team_prompt(analyses),
+                config=get_generate_config(),
+            )
 
         return response.text
     except Exception as e:
-        raise Exception(f"AI recommendation generation failed: {e}")
\ No newline at end of file
+        raise Exception(f"AI team recommendation generation failed: {e}")
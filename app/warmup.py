@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from app.elastic_client import get_es
+from app.leetify_client import get_async_client
+from app.reference_store import reference_store
+from app import vertex_client
+
+load_dotenv()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+
+async def _open_leetify_pool():
+    # Any response will do: it leaves a TLS connection in the shared pool
+    await get_async_client().head("/")
+
+
+class Warmup:
+    """Background warm-up run once at startup, backing the /ready endpoint.
+
+    Loads the reference tables, opens the Elasticsearch and Leetify connection
+    pools and prepares the Gemini client in parallel. The instance is ready
+    once warm-up has finished and the reference tables are loaded; the other
+    steps are best effort and only reported, while loading the tables is
+    retried every `retry_seconds` until it succeeds. With warm-up disabled the
+    instance is ready right away and everything is created on first use.
+    """
+
+    def __init__(self, enabled=WARMUP_ENABLED, timeout=WARMUP_TIMEOUT, retry_seconds=WARMUP_RETRY_SECONDS):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.checks = {}
+        self.finished = False
+        self._task = None
+
+    @property
+    def ready(self):
+        return self.finished and (not self.enabled or reference_store.loaded)
+
+    async def _check(self, name, step):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), self.timeout)
+            self.checks[name] = {"ok": True}
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:300]
+            print(f"Warm-up step {name} failed: {error}")
+            self.checks[name] = {"ok": False, "error": error}
+        self.checks[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+    async def run(self):
+        if self.enabled:
+            await asyncio.gather(
+                self._check("reference_tables", reference_store.get),
+                self._check("elasticsearch", lambda: get_es().info()),
+                self._check("leetify", _open_leetify_pool),
+                self._check("gemini", vertex_client.warm_up),
+            )
+        self.finished = True
+        # Not ready without reference tables, and no traffic arrives to load them
+        while self.enabled and not reference_store.loaded:
+            await asyncio.sleep(self.retry_seconds)
+            await self._check("reference_tables", reference_store.get)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def status(self):
+        return {"ready": self.ready, "warmup_finished": self.finished,
+                "reference_tables_loaded": reference_store.loaded, "reference_source": reference_store.source,
+                "checks": self.checks}
+
+
+warmup = Warmup()
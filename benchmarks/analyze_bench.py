@@ -0,0 +1,173 @@
+"""Offline latency/throughput benchmark of the real FastAPI app.
+
+Runs `app.main:app` under uvicorn against local stand-ins for all three
+external services: the mock Leetify server (synthetic or recorded payloads),
+the fake Elasticsearch serving the reference indexes, and a fake Gemini client
+with configurable latency. Reports p50/p95/p99 latency and throughput per
+concurrency level:
+
+    python -m benchmarks.analyze_bench --concurrency 1 8 32 --requests 200
+    python -m benchmarks.analyze_bench --recordings benchmarks/recordings --json results.json
+
+Each request uses a fresh Steam ID and the recommendation cache is disabled,
+so every request exercises the full hot path unless --with-caches is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+HOST = "127.0.0.1"
+LEETIFY_PORT = 8771
+ELASTIC_PORT = 8772
+APP_PORT = 8773
+
+
+def configure_environment(with_caches, offline_references):
+    # Read by the app modules at import time, so this runs before importing app.main
+    os.environ["LEETIFY_BASE_URL"] = f"http://{HOST}:{LEETIFY_PORT}"
+    os.environ.setdefault("LEETIFY_API_KEY", "benchmark")
+    os.environ["ELASTIC_URL"] = f"http://{HOST}:{ELASTIC_PORT}"
+    os.environ.setdefault("ELASTIC_API_KEY", "benchmark")
+    os.environ.setdefault("GCP_PROJECT_ID", "benchmark")
+    os.environ.setdefault("GCP_LOCATION", "us-central1")
+    # The mock Leetify has no quota; export these to measure the client-side rate limiter
+    os.environ.setdefault("LEETIFY_RATE_LIMIT", "100000")
+    os.environ.setdefault("LEETIFY_BURST", "100000")
+    os.environ.setdefault("LEETIFY_MAX_CONCURRENCY", "100000")
+    # Keep the benchmark's reference tables out of the app's own snapshot file
+    os.environ["REFERENCE_SNAPSHOT_PATH"] = os.path.join(tempfile.mkdtemp(), "reference_tables.jsonl")
+    if offline_references:
+        # Serve reference tables only from a snapshot of the fake indexes
+        from app.reference_snapshot import write_reference_snapshot
+        from benchmarks.fake_elasticsearch import reference_tables
+
+        write_reference_snapshot(os.environ["REFERENCE_SNAPSHOT_PATH"], reference_tables(), source="benchmark")
+        os.environ["REFERENCE_ES_SYNC"] = "false"
+    if not with_caches:
+        os.environ["RECOMMENDATION_CACHE_SIZE"] = "0"
+        os.environ["RECOMMENDATION_CACHE_PERSISTENT"] = "false"
+        os.environ["SINGLE_FLIGHT_GRACE_SECONDS"] = "0"
+        os.environ["LEETIFY_CACHE_MAX_BYTES"] = "0"
+
+
+def wait_until_ready(timeout=30.0):
+    """Block until the app reports ready, so warm-up is not part of the measurement."""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://{HOST}:{APP_PORT}/ready").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise Exception(f"App was not ready after {timeout}s")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_level(path, concurrency, total_requests, level):
+    import httpx
+
+    latencies = []
+    errors = 0
+    next_request = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://{HOST}:{APP_PORT}", limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal next_request, errors
+            while next_request < total_requests:
+                i = next_request
+                next_request += 1
+                steam_id = f"765611980{level:03d}{i:05d}"
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path.format(steam_id=steam_id))
+                    # Streaming endpoints are timed to the last byte
+                    await response.aread()
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/analyze/{steam_id}")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--leetify-latency", type=float, default=0.15)
+    parser.add_argument("--gemini-latency", type=float, default=2.0)
+    parser.add_argument("--gemini-first-token", type=float, default=0.4)
+    parser.add_argument("--recordings", help="directory of recorded Leetify payloads")
+    parser.add_argument("--with-caches", action="store_true", help="keep the recommendation cache and grace window on")
+    parser.add_argument("--offline-references", action="store_true",
+                        help="load reference tables from a local snapshot instead of Elasticsearch")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    configure_environment(args.with_caches, args.offline_references)
+
+    from app import main as app_main
+    from app import vertex_client
+    from benchmarks import fake_elasticsearch, mock_leetify
+    from benchmarks.fake_gemini import FakeGeminiClient
+    from benchmarks.servers import serve_in_thread, start_in_thread
+
+    vertex_client.client = FakeGeminiClient(args.gemini_latency, args.gemini_first_token)
+
+    stop_leetify = start_in_thread(
+        mock_leetify.create_app(latency=args.leetify_latency, recordings_dir=args.recordings), HOST, LEETIFY_PORT
+    )
+    stop_elastic = start_in_thread(fake_elasticsearch.create_app(), HOST, ELASTIC_PORT)
+    stop_app = serve_in_thread(app_main.app, HOST, APP_PORT)
+
+    results = []
+    try:
+        wait_until_ready()
+        print(f"{'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for level, concurrency in enumerate(args.concurrency):
+            result = asyncio.run(run_level(args.path, concurrency, args.requests, level))
+            results.append(result)
+            print(f"{result['concurrency']:>5} {result['requests']:>6} {result['errors']:>6} "
+                  f"{result['throughput_rps']:>8.1f} {result['p50_ms']:>9.1f} "
+                  f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+    finally:
+        stop_app()
+        stop_elastic()
+        stop_leetify()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"path": args.path, "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
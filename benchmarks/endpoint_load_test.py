@@ -0,0 +1,132 @@
+"""Requests-per-second of the profile/matches endpoints against a mock Leetify.
+
+Compares the previous blocking implementation (sync endpoints on the
+threadpool, one `requests` call each) with the async endpoints on the shared
+pooled client:
+
+    python -m benchmarks.endpoint_load_test --concurrency 64 --duration 10 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import time
+
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8765
+APP_PORT = 8766
+
+# Must be set before app.leetify_client reads it at import time
+os.environ["LEETIFY_BASE_URL"] = f"http://{MOCK_HOST}:{MOCK_PORT}"
+os.environ.setdefault("LEETIFY_API_KEY", "benchmark")
+# Measure the upstream path, not the response cache
+os.environ["LEETIFY_CACHE_MAX_BYTES"] = "0"
+# ...nor the client-side rate limiter; export these to measure it instead
+os.environ.setdefault("LEETIFY_RATE_LIMIT", "100000")
+os.environ.setdefault("LEETIFY_BURST", "100000")
+os.environ.setdefault("LEETIFY_MAX_CONCURRENCY", "100000")
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from app import leetify_client
+from benchmarks.mock_leetify import create_app
+from benchmarks.servers import serve_in_thread, start_in_thread
+
+
+def build_blocking_app():
+    app = FastAPI()
+
+    @app.get("/player/{steam_id}/profile")
+    def fetch_profile(steam_id: str):
+        try:
+            return {"status": "success", "profile": leetify_client.get_player_profile(steam_id)}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.get("/player/{steam_id}/matches")
+    def fetch_and_store_matches(steam_id: str):
+        try:
+            matches = leetify_client.get_player_matches(steam_id)
+            return {"status": "success", "matches_indexed": len(matches), "matches": matches}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return app
+
+
+def build_async_app():
+    app = FastAPI()
+
+    @app.get("/player/{steam_id}/profile")
+    async def fetch_profile(steam_id: str):
+        try:
+            return {"status": "success", "profile": await leetify_client.fetch_player_profile(steam_id)}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.get("/player/{steam_id}/matches")
+    async def fetch_and_store_matches(steam_id: str):
+        try:
+            matches = await leetify_client.fetch_player_matches(steam_id)
+            return {"status": "success", "matches_indexed": len(matches), "matches": matches}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await leetify_client.close_async_client()
+
+    return app
+
+
+async def run_load(path, concurrency, duration):
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://{MOCK_HOST}:{APP_PORT}", limits=limits, timeout=60) as client:
+        async def worker(worker_id):
+            nonlocal completed, errors
+            i = 0
+            while time.perf_counter() < deadline:
+                steam_id = f"7656119{worker_id:05d}{i:05d}"
+                i += 1
+                try:
+                    response = await client.get(path.format(steam_id=steam_id))
+                    if response.status_code == 200:
+                        completed += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return completed / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock Leetify latency in seconds")
+    args = parser.parse_args()
+
+    stop_mock = start_in_thread(create_app(latency=args.latency), MOCK_HOST, MOCK_PORT)
+    try:
+        for label, build in (("before (sync)", build_blocking_app), ("after (async)", build_async_app)):
+            stop_app = serve_in_thread(build(), MOCK_HOST, APP_PORT)
+            try:
+                for path in ("/player/{steam_id}/profile", "/player/{steam_id}/matches"):
+                    rps, errors = asyncio.run(run_load(path, args.concurrency, args.duration))
+                    print(f"{label:14} {path:30} {rps:8.1f} req/s  errors={errors}")
+            finally:
+                stop_app()
+    finally:
+        stop_mock()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Minimal Elasticsearch stand-in for offline benchmarks.
+
+Implements just the endpoints the app uses: cluster info, `_search` over the
+three reference indexes and over indexed documents (returned as a single
+scroll page), single-document `index`, `get` and `delete`, and `_bulk`. Responses carry the
+product header the official client checks for.
+"""
+import json
+from aiohttp import web
+
+PRODUCT_HEADERS = {"X-Elastic-Product": "Elasticsearch"}
+SHARDS = {"total": 1, "successful": 1, "skipped": 0, "failed": 0}
+
+DETAILED_FIELDS = {
+    "accuracy_enemy_spotted": 33.0,
+    "accuracy_head": 19.0,
+    "counter_strafing_good_shots_ratio": 75.0,
+    "flashbang_hit_foe_avg_duration": 2.5,
+    "flashbang_hit_foe_per_flashbang": 0.6,
+    "flashbang_hit_friend_per_flashbang": 0.3,
+    "flashbang_leading_to_kill": 5.0,
+    "he_foes_damage_avg": 8.0,
+    "he_friends_damage_avg": 0.8,
+    "preaim": 10.0,
+    "reaction_time_ms": 600.0,
+    "spray_accuracy": 30.0,
+    "utility_on_death_avg": 250.0,
+}
+
+
+def _bracket(low, high, step):
+    doc = {"Lower Bound": low, "Upper Bound": high, "Aim": 50 + step * 5,
+           "Positioning": 50 + step * 4, "Utility": 50 + step * 4}
+    for field, base in DETAILED_FIELDS.items():
+        doc[field] = round(base * (1 + 0.03 * step), 3)
+    return doc
+
+
+REFERENCE_DOCS = {
+    "leetify-references": [
+        {"Tier": "Poor", "Lower Bound": -100, "Upper Bound": -2.01},
+        {"Tier": "Subpar", "Lower Bound": -2, "Upper Bound": -0.51},
+        {"Tier": "Average", "Lower Bound": -0.5, "Upper Bound": 0.5},
+        {"Tier": "Good", "Lower Bound": 0.51, "Upper Bound": 2},
+        {"Tier": "Great", "Lower Bound": 2.01, "Upper Bound": 100},
+    ],
+    "premier-references": [_bracket(low, low + 4999, i) for i, low in enumerate(range(0, 35000, 5000))],
+    "faceit-references": [_bracket(low, high, i) for i, (low, high) in enumerate(
+        [(100, 800), (801, 950), (951, 1100), (1101, 1250), (1251, 1400),
+         (1401, 1550), (1551, 1700), (1701, 1850), (1851, 2000), (2001, 5000)])],
+}
+
+
+def reference_tables(reference_docs=REFERENCE_DOCS):
+    """The reference docs as `(premier_reference, faceit_reference, leetify_tiers)`."""
+    from app.elastic_reference_loader import reference_tables_from_documents
+
+    return reference_tables_from_documents(reference_docs["leetify-references"],
+                                           reference_docs["premier-references"],
+                                           reference_docs["faceit-references"])
+
+
+def create_app(reference_docs=REFERENCE_DOCS):
+    documents = {}
+
+    def respond(body, status=200):
+        return web.json_response(body, status=status, headers=PRODUCT_HEADERS)
+
+    async def info(request):
+        return respond({"cluster_name": "fake", "version": {"number": "8.11.0"}, "tagline": "You Know, for Search"})
+
+    async def search(request):
+        index = request.match_info["index"]
+        if index in reference_docs:
+            hits = [{"_index": index, "_id": str(i), "_source": doc} for i, doc in enumerate(reference_docs[index])]
+        else:
+            hits = [{"_index": i, "_id": doc_id, "_source": doc}
+                    for (i, doc_id), doc in documents.items() if i == index]
+        body = {"_shards": SHARDS, "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}
+        if "scroll" in request.query:
+            # Everything fits in the first page; the follow-up scroll returns nothing
+            body["_scroll_id"] = "fake"
+        return respond(body)
+
+    async def scroll(request):
+        if request.method == "DELETE":
+            return respond({"succeeded": True, "num_freed": 1})
+        return respond({"_scroll_id": "fake", "_shards": SHARDS, "hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}})
+
+    async def index_doc(request):
+        index, doc_id = request.match_info["index"], request.match_info["id"]
+        documents[(index, doc_id)] = await request.json()
+        return respond({"_index": index, "_id": doc_id, "result": "created"}, status=201)
+
+    async def get_doc(request):
+        index, doc_id = request.match_info["index"], request.match_info["id"]
+        if (index, doc_id) not in documents:
+            return respond({"_index": index, "_id": doc_id, "found": False}, status=404)
+        return respond({"_index": index, "_id": doc_id, "found": True, "_source": documents[(index, doc_id)]})
+
+    async def delete_doc(request):
+        index, doc_id = request.match_info["index"], request.match_info["id"]
+        if documents.pop((index, doc_id), None) is None:
+            return respond({"_index": index, "_id": doc_id, "result": "not_found"}, status=404)
+        return respond({"_index": index, "_id": doc_id, "result": "deleted"})
+
+    async def bulk(request):
+        lines = [line for line in (await request.text()).splitlines() if line.strip()]
+        items = []
+        for action_line, source_line in zip(lines[0::2], lines[1::2]):
+            action = json.loads(action_line)["index"]
+            documents[(action["_index"], action["_id"])] = json.loads(source_line)
+            items.append({"index": {"_index": action["_index"], "_id": action["_id"], "status": 201}})
+        return respond({"took": 1, "errors": False, "items": items})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_get("/", info)
+    app.router.add_route("*", "/_search/scroll", scroll)
+    app.router.add_route("*", "/{index}/_search", search)
+    app.router.add_route("PUT", "/{index}/_doc/{id}", index_doc)
+    app.router.add_route("POST", "/{index}/_doc/{id}", index_doc)
+    app.router.add_get("/{index}/_doc/{id}", get_doc)
+    app.router.add_delete("/{index}/_doc/{id}", delete_doc)
+    app.router.add_put("/_bulk", bulk)
+    app.router.add_post("/_bulk", bulk)
+    return app
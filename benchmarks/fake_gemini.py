@@ -0,0 +1,62 @@
+"""Drop-in replacement for the google-genai client with configurable latency.
+
+Only implements `client.aio.models.generate_content`, the async
+`generate_content_stream` and the sync `client.models.generate_content_stream`
+read by the streaming endpoint, which is all the app calls.
+"""
+import asyncio
+import time
+
+CANNED_RESPONSE = (
+    "**Overall Score: 72/100**\n\n"
+    "1. Work on your [Counter-Strafing] in aim_botz, 15 minutes a day.\n"
+    "2. Practise smokes and flashes for your main maps to lift [Flash Effectiveness].\n"
+    "3. Review your deaths for [Utility on Death] and use grenades before committing.\n"
+)
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModels:
+    def __init__(self, latency, first_token_latency, chunks):
+        self.latency = latency
+        self.first_token_latency = first_token_latency
+        self.chunks = chunks
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.latency)
+        return _Response(CANNED_RESPONSE)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        await asyncio.sleep(self.first_token_latency)
+        size = max(1, len(CANNED_RESPONSE) // self.chunks)
+        pieces = [CANNED_RESPONSE[i:i + size] for i in range(0, len(CANNED_RESPONSE), size)]
+        per_chunk = max(0.0, self.latency - self.first_token_latency) / len(pieces)
+        for piece in pieces:
+            yield _Response(piece)
+            await asyncio.sleep(per_chunk)
+
+
+class _FakeSyncModels(_FakeModels):
+    def generate_content_stream(self, model, contents, config=None):
+        time.sleep(self.first_token_latency)
+        size = max(1, len(CANNED_RESPONSE) // self.chunks)
+        pieces = [CANNED_RESPONSE[i:i + size] for i in range(0, len(CANNED_RESPONSE), size)]
+        per_chunk = max(0.0, self.latency - self.first_token_latency) / len(pieces)
+        for piece in pieces:
+            yield _Response(piece)
+            time.sleep(per_chunk)
+
+
+class _FakeAio:
+    def __init__(self, models):
+        self.models = models
+
+
+class FakeGeminiClient:
+    def __init__(self, latency=2.0, first_token_latency=0.4, chunks=20):
+        self.aio = _FakeAio(_FakeModels(latency, first_token_latency, chunks))
+        self.models = _FakeSyncModels(latency, first_token_latency, chunks)
@@ -0,0 +1,90 @@
+"""Vectorized match-history trends versus a naive per-match Python loop.
+
+    python -m benchmarks.match_trends_bench --matches 100 1000 5000
+"""
+import argparse
+import time
+from app.data_processing import DETAILED_METRICS
+from app.match_trends import MATCH_FIELD_ALIASES, ROLLING_WINDOW, RECENT_MATCHES, compute_match_trends
+from benchmarks.mock_leetify import make_matches
+
+STEAM_ID = "76561198000000000"
+
+
+def naive_match_trends(matches, steam_id, metrics, window=ROLLING_WINDOW, recent=RECENT_MATCHES):
+    """Same statistics as compute_match_trends, one match and one metric at a time."""
+    rows = []
+    for match in sorted(matches, key=lambda m: m.get("finished_at") or ""):
+        for entry in match.get("stats", []):
+            if str(entry.get("steam64_id")) == steam_id:
+                rows.append((match.get("map_name") or "unknown", entry))
+
+    result = {}
+    for metric in metrics:
+        series = []
+        for _, entry in rows:
+            value = None
+            for field, scale in MATCH_FIELD_ALIASES.get(metric, [(metric, 1.0)]):
+                if entry.get(field) is not None:
+                    value = entry[field] * scale
+                    break
+            series.append(value)
+        present = [(i, v) for i, v in enumerate(series) if v is not None]
+        if not present:
+            continue
+        lifetime = sum(v for _, v in present) / len(present)
+        recent_values = [v for v in series[-recent:] if v is not None]
+        recent_avg = sum(recent_values) / len(recent_values) if recent_values else None
+
+        rolling = []
+        for end in range(window, len(series) + 1):
+            chunk = [v for v in series[end - window:end] if v is not None]
+            rolling.append(sum(chunk) / len(chunk) if chunk else None)
+
+        mean_x = sum(i for i, _ in present) / len(present)
+        mean_y = lifetime
+        num = sum((i - mean_x) * (v - mean_y) for i, v in present)
+        den = sum((i - mean_x) ** 2 for i, _ in present)
+        slope = num / den if den else None
+
+        per_map = {}
+        for (map_name, _), value in zip(rows, series):
+            if value is not None:
+                total, count = per_map.get(map_name, (0.0, 0))
+                per_map[map_name] = (total + value, count + 1)
+
+        result[metric] = {
+            "lifetime": lifetime,
+            "recent": recent_avg,
+            "trend_slope": slope,
+            "rolling_avg": rolling,
+            "maps": {m: t / c for m, (t, c) in per_map.items()},
+        }
+    return result
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--matches", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'matches':>8} {'naive ms':>10} {'vectorized ms':>14} {'speedup':>8}")
+    for count in args.matches:
+        matches = make_matches(STEAM_ID, count)
+        naive = best_of(lambda: naive_match_trends(matches, STEAM_ID, DETAILED_METRICS), args.repeat)
+        vectorized = best_of(lambda: compute_match_trends(matches, STEAM_ID, DETAILED_METRICS), args.repeat)
+        print(f"{count:>8} {naive * 1000:>10.2f} {vectorized * 1000:>14.2f} {naive / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Local stand-in for the Leetify public API, used by the load tests.
+
+Serves `/v3/profile` and `/v3/profile/matches` after a configurable delay, so
+throughput can be measured without the real API. Payloads are replayed from a
+recordings directory (see `benchmarks.record_leetify`) when one is given, and
+generated synthetically otherwise.
+"""
+import asyncio
+import random
+import zlib
+from pathlib import Path
+from aiohttp import web
+
+MAPS = ["de_mirage", "de_inferno", "de_nuke", "de_ancient", "de_anubis", "de_dust2", "de_train"]
+
+
+def make_profile(steam_id):
+    rng = random.Random(steam_id)
+    return {
+        "steam64_id": steam_id,
+        "name": f"player_{steam_id[-4:]}",
+        "ranks": {"premier": rng.randint(5000, 25000), "faceit": None, "faceit_elo": None},
+        "rating": {
+            "aim": rng.uniform(40, 90),
+            "positioning": rng.uniform(40, 90),
+            "utility": rng.uniform(40, 90),
+            "clutch": rng.uniform(-0.1, 0.1),
+            "opening": rng.uniform(-0.1, 0.1),
+            "ct_leetify": rng.uniform(-0.05, 0.05),
+            "t_leetify": rng.uniform(-0.05, 0.05),
+        },
+        "stats": {
+            "accuracy_enemy_spotted": rng.uniform(25, 45),
+            "accuracy_head": rng.uniform(10, 30),
+            "counter_strafing_good_shots_ratio": rng.uniform(60, 90),
+            "flashbang_hit_foe_avg_duration": rng.uniform(1.5, 3.5),
+            "flashbang_hit_foe_per_flashbang": rng.uniform(0.3, 1.0),
+            "flashbang_hit_friend_per_flashbang": rng.uniform(0.1, 0.5),
+            "flashbang_leading_to_kill": rng.uniform(2, 10),
+            "he_foes_damage_avg": rng.uniform(4, 12),
+            "he_friends_damage_avg": rng.uniform(0.1, 2),
+            "preaim": rng.uniform(6, 14),
+            "reaction_time_ms": rng.uniform(450, 750),
+            "spray_accuracy": rng.uniform(20, 45),
+            "utility_on_death_avg": rng.uniform(100, 400),
+        },
+    }
+
+
+def make_matches(steam_id, count=100):
+    rng = random.Random(f"{steam_id}-matches")
+    matches = []
+    for i in range(count):
+        matches.append({
+            "id": f"{steam_id}-{i}",
+            "finished_at": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T20:00:00.000Z",
+            "map_name": rng.choice(MAPS),
+            "stats": [{
+                "steam64_id": steam_id,
+                "accuracy_enemy_spotted": rng.uniform(20, 50),
+                "accuracy_head": rng.uniform(5, 35),
+                "spray_accuracy": rng.uniform(15, 50),
+                "preaim": rng.uniform(5, 16),
+                "reaction_time": rng.uniform(0.4, 0.8),
+                "leetify_rating": rng.uniform(-0.1, 0.1),
+            }],
+        })
+    return matches
+
+
+def load_recordings(directory):
+    """Load `profile_<steam_id>.json` / `matches_<steam_id>.json` pairs, keyed by Steam ID."""
+    recordings = {}
+    for path in sorted(Path(directory).glob("profile_*.json")):
+        steam_id = path.stem[len("profile_"):]
+        matches_path = path.with_name(f"matches_{steam_id}.json")
+        if matches_path.exists():
+            recordings[steam_id] = (path.read_bytes(), matches_path.read_bytes())
+    return recordings
+
+
+def create_app(latency=0.1, jitter=0.0, match_count=100, recordings_dir=None):
+    recordings = load_recordings(recordings_dir) if recordings_dir else {}
+    # Unknown Steam IDs cycle through the recorded players so every ID gets real-shaped data
+    replay = list(recordings.items())
+
+    async def delay():
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    def recorded(steam_id):
+        if steam_id in recordings:
+            return recordings[steam_id]
+        # crc32 rather than hash(), which is salted per process, so runs stay comparable
+        recorded_id, (profile_body, matches_body) = replay[zlib.crc32(steam_id.encode()) % len(replay)]
+        # Rewrite the recorded ID so per-match stats still line up with the requested player
+        old, new = recorded_id.encode(), steam_id.encode()
+        return profile_body.replace(old, new), matches_body.replace(old, new)
+
+    async def profile(request):
+        await delay()
+        steam_id = request.query.get("steam64_id", "0")
+        if replay:
+            return web.Response(body=recorded(steam_id)[0], content_type="application/json")
+        return web.json_response(make_profile(steam_id))
+
+    async def matches(request):
+        await delay()
+        steam_id = request.query.get("steam64_id", "0")
+        if replay:
+            return web.Response(body=recorded(steam_id)[1], content_type="application/json")
+        return web.json_response(make_matches(steam_id, match_count))
+
+    async def validate(request):
+        return web.json_response({"valid": True})
+
+    app = web.Application()
+    app.router.add_get("/v3/profile", profile)
+    app.router.add_get("/v3/profile/matches", matches)
+    app.router.add_get("/api-key/validate", validate)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="127.0.0.1", port=8765)
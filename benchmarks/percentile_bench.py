@@ -0,0 +1,58 @@
+"""Percentile rank lookups against a memory-mapped snapshot plus delta.
+
+    python -m benchmarks.percentile_bench --players 10000 100000 --delta 500
+
+Writes a synthetic snapshot of N players spread over the Premier brackets,
+observes --delta more analyses on top of it and times `ranks()` per analysis.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from app.percentile_index import PERCENTILE_METRICS, PercentileIndex, analysis_values, write_snapshot
+
+BRACKETS = [f"Premier {low}-{low + 4999}" for low in range(0, 35000, 5000)]
+
+
+def synthetic_analysis(metrics):
+    analysis = {"reference_rank": random.choice(BRACKETS)}
+    for metric in metrics:
+        analysis[f"{metric}_diff"] = round(random.gauss(0, 5), 2)
+    return analysis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--delta", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'players':>9} {'write s':>8} {'file MB':>8} {'rank us':>8}")
+    for count in args.players:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "percentiles.bin")
+            players = {str(76561198000000000 + i): analysis_values(synthetic_analysis(PERCENTILE_METRICS))
+                       for i in range(count)}
+            started = time.perf_counter()
+            write_snapshot(path, players)
+            write_seconds = time.perf_counter() - started
+
+            index = PercentileIndex(path=path, compact_threshold=args.delta + 1)
+            index.reload()
+            for i in range(args.delta):
+                index.observe(str(76561198000000000 + random.randrange(count * 2)), synthetic_analysis(PERCENTILE_METRICS))
+
+            probes = [synthetic_analysis(PERCENTILE_METRICS) for _ in range(args.lookups)]
+            started = time.perf_counter()
+            for analysis in probes:
+                index.ranks(analysis)
+            per_lookup = (time.perf_counter() - started) / args.lookups
+
+            print(f"{count:>9} {write_seconds:>8.2f} {os.path.getsize(path) / 1e6:>8.1f} {per_lookup * 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
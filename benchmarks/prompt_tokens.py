@@ -0,0 +1,160 @@
+"""Prompt size and latency of the compact prompt builder versus the old prompt.
+
+Builds analyses from synthetic Leetify payloads against the benchmark
+reference tables and reports tokens per prompt for the old prompt (static
+instructions plus the full analysis repr) and the compact ranked table plus
+the system-instruction preamble:
+
+    python -m benchmarks.prompt_tokens --players 20
+    python -m benchmarks.prompt_tokens --players 5 --live
+
+Token counts come from Gemini's count_tokens when Vertex AI credentials are
+configured and fall back to a 4-characters-per-token estimate otherwise.
+--live also times real end-to-end generate_content calls for both prompts.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+PLAYER_PREFIX = "7656119800000"
+
+
+def legacy_prompt(analysis):
+    """The pre-v2 prompt: static instructions plus the whole analysis repr."""
+    metric_names = analysis.get('metric_names', {})
+
+    return f"""
+        You are a Counter-Strike 2 coach analyzing player performance data. Here's what each metric means:
+
+        IMPORTANT: Ignore the "leetify_tiers" field in the data - this is for frontend display only and should not be included in your analysis.
+
+        METRIC NAME CONVERSIONS (use these readable names in your response instead of the keys):
+        {metric_names}
+
+        PERFORMANCE METRICS (all *_diff values show difference from rank average - negative = below average):
+        - aim_diff: Difference from rank average aim rating
+        - positioning_diff: Difference from rank average positioning rating  
+        - utility_diff: Difference from rank average utility usage
+        - accuracy_enemy_spotted_diff: Difference in accuracy when enemy spotted on radar (%)
+        - accuracy_head_diff: Difference in headshot accuracy (%)
+        - counter_strafing_good_shots_ratio_diff: Difference in % of shots with proper counter-strafing
+        - flashbang_hit_foe_avg_duration_diff: Difference in average blind duration on enemies (seconds)
+        - flashbang_hit_foe_per_flashbang_diff: Difference in enemies blinded per flashbang
+        - flashbang_hit_friend_per_flashbang_diff: Difference in teammates accidentally blinded (lower is better)
+        - flashbang_leading_to_kill_diff: Difference in % of flashbangs leading to kills
+        - he_foes_damage_avg_diff: Difference in average HE grenade damage to enemies
+        - he_friends_damage_avg_diff: Difference in HE damage to teammates (lower is better)
+        - preaim_diff: Difference in degrees of time crosshair pre-positioned at angles
+        - reaction_time_ms_diff: Difference in reaction time (negative = faster, positive = slower)
+        - spray_accuracy_diff: Difference in spray control accuracy (%)
+        - utility_on_death_avg_diff: Difference in utility value held when dying (negative = better)
+        - clutch: Raw clutch situation performance rating (zero-sum: 0=average, positive=above average, negative=below average)
+        - clutch_tier: Performance tier (poor/subpar/average/good/great)
+        - opening: Raw opening duel performance rating (zero-sum: 0=average, positive=above average, negative=below average)
+        - opening_tier: Performance tier (poor/subpar/average/good/great)
+        - ct_leetify: Raw Counter-Terrorist side performance rating (zero-sum: 0=average, positive=above average, negative=below average)
+        - ct_leetify_tier: Performance tier (poor/subpar/average/good/great)
+        - t_leetify: Raw Terrorist side performance rating (zero-sum: 0=average, positive=above average, negative=below average)
+        - t_leetify_tier: Performance tier (poor/subpar/average/good/great)
+
+        Please note the following when reading through the metrics:
+        - reaction_time_ms and utility_on_death_avg are large numbers, so the magnitude of their diff metrics should have less weight
+        - flashbang_hit_foe_avg_duration, flashbang_hit_foe_per_flashbang, flashbang_hit_friend_per_flashbang, flashbang_leading_to_kill, he_foes_damage_avg, he_friends_damage_avg, and preaim are small numbers, so the magnitude of their diff metrics should have more weight
+        - flashbang_hit_friend_per_flashbang, he_friends_damage_avg, preaim, reactin_time_ms, and utility_on_death_avg are all metrics that indicate above average performance if the diff is negative, since the numbers for these metrics decrease as skill increases
+
+        IMPORTANT: When mentioning metrics in your response, use the readable names from the conversion table above, not the technical keys. Wrap metric names in brackets like [Aim] or [Headshot Accuracy] to make them stand out.
+
+        PLAYER DATA:
+        {analysis}
+
+        Based on this data, provide:
+        1. An overall performance score out of 100 compared to their rank average (consider all metrics, with more weight on core skills like aim, positioning, utility)
+        2. 3-4 specific, actionable training recommendations. Focus on the biggest weaknesses first. Include specific workshop maps, aim trainers, or practice routines where relevant.
+        
+        Format your response as:
+        **Overall Score: X/100**
+        
+        [Your recommendations here]
+        
+        You should also refer to the player directly, as if you're talking to the player.
+        """
+
+
+def sample_analyses(count, with_matches):
+    from app.data_processing import build_analysis
+    from app.reference_store import ReferenceTables
+    from benchmarks.fake_elasticsearch import reference_tables
+    from benchmarks.mock_leetify import make_matches, make_profile
+
+    tables = ReferenceTables(*reference_tables())
+    analyses = []
+    for i in range(count):
+        steam_id = f"{PLAYER_PREFIX}{i:04d}"
+        matches = make_matches(steam_id) if with_matches else None
+        analyses.append(build_analysis(make_profile(steam_id), tables, matches, steam_id))
+    return analyses
+
+
+def token_counter(use_api):
+    if use_api:
+        from app.vertex_client import MODEL, get_client
+
+        def count(text, system_instruction=None):
+            # Vertex count_tokens rejects a system instruction config, so count it as content
+            contents = [system_instruction, text] if system_instruction else text
+            return get_client().models.count_tokens(model=MODEL, contents=contents).total_tokens
+        return count, "count_tokens"
+
+    def estimate(text, system_instruction=None):
+        return (len(text) + len(system_instruction or "")) // 4
+    return estimate, "estimate (chars / 4)"
+
+
+async def time_generation(prompts, config):
+    from app.vertex_client import MODEL, get_client
+
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        await get_client().aio.models.generate_content(model=MODEL, contents=prompt, config=config)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--no-matches", action="store_true", help="analyse profiles without match history")
+    parser.add_argument("--live", action="store_true", help="call Gemini and time both prompts end to end")
+    args = parser.parse_args()
+
+    from app.prompt_builder import PREAMBLE, build_player_prompt
+    from app.vertex_client import get_generate_config
+
+    use_api = os.path.exists(os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")) or args.live
+    count, method = token_counter(use_api)
+    analyses = sample_analyses(args.players, not args.no_matches)
+    old_prompts = [legacy_prompt(a) for a in analyses]
+    new_prompts = [build_player_prompt(a) for a in analyses]
+
+    old_tokens = [count(p) for p in old_prompts]
+    new_tokens = [count(p, PREAMBLE) for p in new_prompts]
+    old_mean, new_mean = statistics.mean(old_tokens), statistics.mean(new_tokens)
+    print(f"token counts via {method}, {args.players} players")
+    print(f"{'prompt':>8} {'mean':>8} {'min':>8} {'max':>8}")
+    print(f"{'old':>8} {old_mean:>8.0f} {min(old_tokens):>8} {max(old_tokens):>8}")
+    print(f"{'compact':>8} {new_mean:>8.0f} {min(new_tokens):>8} {max(new_tokens):>8}")
+    print(f"reduction: {100 * (1 - new_mean / old_mean):.1f}%")
+
+    if args.live:
+        old_latency = asyncio.run(time_generation(old_prompts, None))
+        new_latency = asyncio.run(time_generation(new_prompts, get_generate_config()))
+        print(f"{'prompt':>8} {'p50 ms':>9} {'max ms':>9}")
+        for name, latencies in (("old", old_latency), ("compact", new_latency)):
+            print(f"{name:>8} {statistics.median(latencies) * 1000:>9.0f} {max(latencies) * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Record real Leetify payloads for replay by the mock server.
+
+    python -m benchmarks.record_leetify 76561198000000000 76561198000000001 --out benchmarks/recordings
+
+Needs LEETIFY_API_KEY. Writes `profile_<steam_id>.json` and `matches_<steam_id>.json`.
+"""
+import argparse
+import json
+from pathlib import Path
+from app.leetify_client import get_player_profile, get_player_matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("steam_ids", nargs="+")
+    parser.add_argument("--out", default="benchmarks/recordings")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    for steam_id in args.steam_ids:
+        profile = get_player_profile(steam_id)
+        matches = get_player_matches(steam_id)
+        (out / f"profile_{steam_id}.json").write_text(json.dumps(profile))
+        (out / f"matches_{steam_id}.json").write_text(json.dumps(matches))
+        print(f"Recorded {steam_id}: {len(matches)} matches")
+
+
+if __name__ == "__main__":
+    main()
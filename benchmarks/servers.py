@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+import uvicorn
+from aiohttp import web
+
+
+def start_in_thread(app, host="127.0.0.1", port=8765):
+    """Run an aiohttp app on its own event loop thread. Returns a stop callable."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, host, port).start())
+        ready.set()
+        loop.run_forever()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return stop
+
+
+def serve_in_thread(app, host="127.0.0.1", port=8766):
+    """Run an ASGI app under uvicorn on a background thread. Returns a stop callable."""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return stop
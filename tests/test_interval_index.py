@@ -0,0 +1,56 @@
+from app.interval_index import IntervalIndex
+
+PREMIER = {(0, 4999): "low", (5000, 9999): "mid", (10000, 14999): "high"}
+
+
+def test_finds_the_interval_at_its_edges():
+    index = IntervalIndex(PREMIER.items(), step=1)
+    assert index.find(0) == ((0, 4999), "low")
+    assert index.find(4999) == ((0, 4999), "low")
+    assert index.find(5000) == ((5000, 9999), "mid")
+    assert index.find(14999) == ((10000, 14999), "high")
+    assert index.find(-1) is None
+    assert index.find(15000) is None
+    assert not index.gaps and not index.overlaps
+
+
+def test_input_order_does_not_matter():
+    index = IntervalIndex(reversed(list(PREMIER.items())), step=1)
+    assert index.find(7500) == ((5000, 9999), "mid")
+
+
+def test_reports_gaps_and_misses_inside_them():
+    index = IntervalIndex([((0, 4999), "a"), ((5001, 9999), "b")], step=1)
+    assert index.gaps == [(4999, 5001)]
+    assert index.find(5000) is None
+    assert index.find(5001) == ((5001, 9999), "b")
+
+
+def test_step_sets_what_counts_as_contiguous():
+    tiers = [((0.0, 1.0), "bronze"), ((1.01, 2.0), "silver")]
+    assert IntervalIndex(tiers, step=0.01).gaps == []
+    assert IntervalIndex(tiers, step=0).gaps == [(1.0, 1.01)]
+
+
+def test_overlapping_and_nested_intervals():
+    index = IntervalIndex([((0, 100), "outer"), ((10, 20), "inner"), ((50, 150), "tail")])
+    assert ((0, 100), (10, 20)) in index.overlaps
+    assert index.find(15) == ((10, 20), "inner")
+    # Past the nested interval, the lookup walks back to the enclosing one
+    assert index.find(30) == ((0, 100), "outer")
+    assert index.find(120) == ((50, 150), "tail")
+
+
+def test_fallback_and_exact_lookup():
+    index = IntervalIndex(PREMIER.items(), fallback=(10000, 14999), step=1)
+    assert index.fallback == ((10000, 14999), "high")
+    assert index.get((5000, 9999)) == "mid"
+    assert index.get((5000, 9998)) is None
+    assert IntervalIndex(PREMIER.items(), fallback=(1, 2)).fallback is None
+
+
+def test_empty_index():
+    index = IntervalIndex([])
+    assert not index
+    assert len(index) == 0
+    assert index.find(1) is None
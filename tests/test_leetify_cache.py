@@ -0,0 +1,62 @@
+import asyncio
+import os
+from app import leetify_cache
+from app.leetify_cache import LeetifyCache, merge_matches
+
+
+def match(match_id, finished_at):
+    return {"id": match_id, "finished_at": finished_at}
+
+
+CACHED = [match("c", "2025-01-03T00:00:00Z"), match("b", "2025-01-02T00:00:00Z"), match("a", "2025-01-01T00:00:00Z")]
+
+
+def test_first_fetch_is_taken_as_is():
+    fresh = [match("a", "2025-01-01T00:00:00Z")]
+    assert merge_matches([], fresh) == (fresh, True)
+
+
+def test_nothing_new_keeps_the_cached_history():
+    # Upstream's window has moved on: "a" aged out, nothing newer arrived
+    fresh = [match("c", "2025-01-03T00:00:00Z"), match("b", "2025-01-02T00:00:00Z")]
+    matches, changed = merge_matches(CACHED, fresh)
+    assert matches is CACHED
+    assert not changed
+
+
+def test_new_matches_are_deduplicated_and_ordered_newest_first():
+    fresh = [
+        match("d", "2025-01-04T00:00:00Z"),
+        match("c", "2025-01-03T00:00:00Z"),
+        match("e", "2025-01-05T00:00:00Z"),
+        match("b", "2025-01-02T00:00:00Z"),
+    ]
+    matches, changed = merge_matches(CACHED, fresh)
+    assert changed
+    assert [m["id"] for m in matches] == ["e", "d", "c", "b", "a"]
+
+
+def test_matches_older_than_the_history_are_not_inserted():
+    fresh = [match("late", "2024-12-31T00:00:00Z"), match("d", "2025-01-04T00:00:00Z")]
+    matches, _ = merge_matches(CACHED, fresh)
+    assert [m["id"] for m in matches] == ["d", "c", "b", "a"]
+
+
+def test_history_is_capped(monkeypatch):
+    monkeypatch.setattr(leetify_cache, "LEETIFY_MATCH_HISTORY_LIMIT", 3)
+    fresh = [match("d", "2025-01-04T00:00:00Z"), match("e", "2025-01-05T00:00:00Z")]
+    matches, _ = merge_matches(CACHED, fresh)
+    assert [m["id"] for m in matches] == ["e", "d", "c"]
+
+
+def test_concurrent_disk_writes_leave_one_complete_file(tmp_path):
+    cache = LeetifyCache(disk_dir=str(tmp_path))
+
+    async def run():
+        await asyncio.gather(*(cache.put("profile", "76561198000000001", {"n": i, "pad": "x" * 20000}, 20000)
+                               for i in range(20)))
+
+    asyncio.run(run())
+    assert os.listdir(tmp_path) == ["profile_76561198000000001.json"]
+    entry = asyncio.run(LeetifyCache(disk_dir=str(tmp_path)).get("profile", "76561198000000001"))
+    assert entry.data["pad"] == "x" * 20000
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import random
+import numpy as np
+from app.data_processing import LOWER_IS_BETTER_METRICS
+from app.percentile_index import PERCENTILE_METRICS, PercentileIndex, Snapshot, analysis_values, write_snapshot
+
+BRACKETS = ["Premier 0-4999", "Premier 5000-9999"]
+
+
+def make_analysis(rng):
+    analysis = {"reference_rank": rng.choice(BRACKETS)}
+    for metric in PERCENTILE_METRICS:
+        # Coarse values so ties are exercised
+        analysis[f"{metric}_diff"] = float(rng.randint(-10, 10))
+    return analysis
+
+
+def brute_force_ranks(players, analysis, min_samples):
+    bracket, values = analysis_values(analysis)
+    ranks = {}
+    for i, metric in enumerate(PERCENTILE_METRICS):
+        run = [v[i] for b, v in players.values() if b == bracket and not np.isnan(v[i])]
+        if len(run) < min_samples:
+            continue
+        below = sum(1 for v in run if v < values[i])
+        equal = sum(1 for v in run if v == values[i])
+        percentile = (below + 0.5 * equal) / len(run) * 100
+        if metric in LOWER_IS_BETTER_METRICS:
+            percentile = 100 - percentile
+        ranks[metric] = round(percentile, 1)
+    return ranks
+
+
+def seeded_index(tmp_path, rng, count=60):
+    path = str(tmp_path / "percentiles.bin")
+    players = {str(i): analysis_values(make_analysis(rng)) for i in range(count)}
+    write_snapshot(path, players)
+    index = PercentileIndex(path=path, min_samples=5, compact_threshold=10_000)
+    assert index.reload()
+    return index, players
+
+
+def test_snapshot_round_trip(tmp_path):
+    rng = random.Random(1)
+    path = str(tmp_path / "percentiles.bin")
+    players = {str(76561198000000000 + i): analysis_values(make_analysis(rng)) for i in range(50)}
+    write_snapshot(path, players, source="elasticsearch", built_at=10.0, rebuilt_at=20.0)
+
+    snapshot = Snapshot(path)
+    assert len(snapshot) == 50
+    assert (snapshot.source, snapshot.built_at, snapshot.rebuilt_at) == ("elasticsearch", 10.0, 20.0)
+    assert snapshot.player("missing") is None
+    for steam_id, (bracket, values) in players.items():
+        stored_bracket, stored_values = snapshot.player(steam_id)
+        assert stored_bracket == bracket
+        assert list(stored_values) == values
+    for run in snapshot.runs.values():
+        assert list(run) == sorted(run)
+    assert not [name for name in tmp_path.iterdir() if name.name.endswith(".tmp")]
+
+
+def test_delta_replaces_snapshot_players(tmp_path):
+    rng = random.Random(2)
+    index, players = seeded_index(tmp_path, rng)
+
+    # Replace some snapshot players, add new ones, then replace a delta player again
+    for steam_id in ["0", "1", "2", "new-1", "new-2", "1"]:
+        analysis = make_analysis(rng)
+        index.observe(steam_id, analysis)
+        players[steam_id] = analysis_values(analysis)
+
+    assert index.players == len(players)
+    assert index.delta_size == 5
+    for _ in range(20):
+        probe = make_analysis(rng)
+        assert index.ranks(probe) == brute_force_ranks(players, probe, index.min_samples)
+
+
+def test_compaction_keeps_ranks(tmp_path):
+    rng = random.Random(3)
+    index, players = seeded_index(tmp_path, rng)
+    for i in range(30):
+        analysis = make_analysis(rng)
+        steam_id = str(rng.randrange(90))
+        index.observe(steam_id, analysis)
+        players[steam_id] = analysis_values(analysis)
+    probes = [make_analysis(rng) for _ in range(20)]
+    before = [index.ranks(probe) for probe in probes]
+
+    asyncio.run(index.compact())
+
+    assert index.delta_size == 0
+    assert index.players == len(players)
+    assert [index.ranks(probe) for probe in probes] == before
+
+    # A second worker mapping the compacted file sees the same ranks
+    other = PercentileIndex(path=index.path, min_samples=index.min_samples)
+    assert other.reload()
+    assert [other.ranks(probe) for probe in probes] == before
+
+
+def test_reload_ignores_a_bad_snapshot(tmp_path):
+    rng = random.Random(4)
+    index, players = seeded_index(tmp_path, rng)
+    probe = make_analysis(rng)
+    expected = index.ranks(probe)
+
+    for content in (b"", b"CS2PCTL1\x10"):
+        # Replaced rather than truncated, as writers do, so the current mapping stays valid
+        bad_path = str(tmp_path / "bad.bin")
+        with open(bad_path, "wb") as f:
+            f.write(content)
+        os.replace(bad_path, index.path)
+        index._snapshot_mtime = None
+        assert not index.reload()
+        assert index.ranks(probe) == expected
+
+
+def test_maintenance_survives_errors_and_stops_cleanly(tmp_path):
+    index = PercentileIndex(path=str(tmp_path / "percentiles.bin"), reload_seconds=0.01)
+    ticks = []
+
+    def failing_tick():
+        ticks.append(1)
+        raise ValueError("boom")
+
+    index._tick = failing_tick
+
+    async def run():
+        index.start()
+        await asyncio.sleep(0.1)
+        assert not index._task.done()
+        await index.stop()
+
+    asyncio.run(run())
+    assert len(ticks) > 1
+    assert index._task is None
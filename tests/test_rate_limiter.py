@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.rate_limiter import AdaptiveLimiter, RateLimitExceeded, TokenBucket, parse_retry_after
+
+
+def test_bucket_allows_a_burst_then_spaces_calls():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_refund_returns_the_token():
+    bucket = TokenBucket(rate=10, burst=1)
+    assert bucket.reserve() == 0.0
+    bucket.refund()
+    assert bucket.reserve() == 0.0
+    # Refunds never push the bucket past its burst
+    bucket.refund()
+    bucket.refund()
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0
+
+
+def test_pause_delays_every_reservation():
+    bucket = TokenBucket(rate=100, burst=10)
+    bucket.pause(2)
+    assert bucket.reserve() == pytest.approx(2, abs=0.05)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_limit_grows_on_success_and_halves_on_throttling():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=8, min_concurrency=2)
+    limiter.limit = 4.0
+
+    async def call(throttled=False):
+        await limiter.acquire(time.monotonic() + 1)
+        await limiter.release(throttled=throttled)
+
+    async def run():
+        # Additive increase: about one per window of `limit` successful calls
+        for _ in range(4):
+            await call()
+        assert 4.9 < limiter.limit < 5.0
+        before = limiter.limit
+        await call(throttled=True)
+        assert limiter.limit == pytest.approx(before / 2)
+        # Multiplicative decrease stops at min_concurrency
+        for _ in range(3):
+            await call(throttled=True)
+        assert limiter.limit == 2
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_failed_calls_leave_the_limit_alone():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=8)
+    limiter.limit = 4.0
+
+    async def run():
+        await limiter.acquire(time.monotonic() + 1)
+        await limiter.release(failed=True)
+
+    asyncio.run(run())
+    assert limiter.limit == 4.0
+    assert limiter.in_flight == 0
+
+
+def test_limit_never_exceeds_max_concurrency():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=2)
+
+    async def run():
+        for _ in range(10):
+            await limiter.acquire(time.monotonic() + 1)
+            await limiter.release()
+
+    asyncio.run(run())
+    assert limiter.limit == 2
+
+
+def test_rate_deadline_refunds_the_token():
+    limiter = AdaptiveLimiter(rate=1, burst=1, max_concurrency=5)
+
+    async def run():
+        await limiter.acquire(time.monotonic() + 1)
+        await limiter.release()
+        with pytest.raises(RateLimitExceeded) as raised:
+            await limiter.acquire(time.monotonic() + 0.1)
+        assert raised.value.retry_after == pytest.approx(1, abs=0.05)
+
+    asyncio.run(run())
+    # Only the first call's token is spent
+    assert limiter.bucket.reserve() == pytest.approx(1, abs=0.05)
+
+
+def test_concurrency_deadline_refunds_the_token():
+    limiter = AdaptiveLimiter(rate=1, burst=2, max_concurrency=1)
+
+    async def run():
+        await limiter.acquire(time.monotonic() + 1)
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire(time.monotonic() + 0.05)
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
+    assert limiter.bucket.reserve() == 0.0
+
+
+def test_threads_and_coroutines_share_the_cap():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=1)
+    limiter.acquire_blocking(time.monotonic() + 1)
+
+    def release_later():
+        time.sleep(0.1)
+        limiter.release_blocking()
+
+    async def run():
+        # Binds the limiter to this loop before the thread releases
+        waiter = asyncio.create_task(limiter.acquire(time.monotonic() + 2))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        started = time.monotonic()
+        threading.Thread(target=release_later).start()
+        await waiter
+        # Woken by the thread's release, not by the deadline
+        assert time.monotonic() - started < 1
+        assert limiter.in_flight == 1
+        await limiter.release()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_blocking_acquire_times_out_while_the_cap_is_held():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=1)
+    limiter.acquire_blocking(time.monotonic() + 1)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire_blocking(time.monotonic() + 0.05)
+    limiter.release_blocking()
+    limiter.acquire_blocking(time.monotonic() + 0.05)
+    assert limiter.in_flight == 1
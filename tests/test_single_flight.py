@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from app.single_flight import SingleFlight
+
+
+def counting(result="value", delay=0.02, error=None):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return fn, calls
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight(grace_period=0)
+    fn, calls = counting()
+
+    async def run():
+        return await asyncio.gather(*(flight.do("player", fn) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["value"] * 10
+    assert len(calls) == 1
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight(grace_period=0)
+    fn, calls = counting()
+
+    async def run():
+        await asyncio.gather(flight.do("a", fn), flight.do("b", fn))
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_result_is_reused_within_the_grace_period_only():
+    flight = SingleFlight(grace_period=0.2)
+    fn, calls = counting(delay=0)
+
+    async def run():
+        await flight.do("player", fn)
+        await flight.do("player", fn)
+        assert len(calls) == 1
+        await asyncio.sleep(0.25)
+        await flight.do("player", fn)
+        assert len(calls) == 2
+        flight.forget("player")
+        await flight.do("player", fn)
+        assert len(calls) == 3
+
+    asyncio.run(run())
+
+
+def test_no_grace_period_recomputes_after_completion():
+    flight = SingleFlight(grace_period=0)
+    fn, calls = counting(delay=0)
+
+    async def run():
+        await flight.do("player", fn)
+        await flight.do("player", fn)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight(grace_period=10)
+    fn, calls = counting(error=ValueError("upstream down"))
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("player", fn) for _ in range(3)), return_exceptions=True)
+        assert len(calls) == 1
+        assert all(isinstance(r, ValueError) and str(r) == "upstream down" for r in results)
+        with pytest.raises(ValueError):
+            await flight.do("player", fn)
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight(grace_period=0)
+    fn, calls = counting(delay=0.05)
+
+    async def run():
+        first = asyncio.create_task(flight.do("player", fn))
+        second = asyncio.create_task(flight.do("player", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "value"
+        assert first.cancelled()
+
+    asyncio.run(run())
+    assert len(calls) == 1